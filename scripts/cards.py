@@ -1,98 +1,26 @@
-import json
 import os
-import re
-import pandas as pd
-from shutil import copy, move
-import copy 
-import io 
+import sys
+from shutil import move
 import fire
 
-pokedex_path = '../Version20/Pokedex/'
-moves_path = '../Version20/Moves/'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databuilder'))
+from card_engine import Card_Engine
+from driver import Driver
 
-def create_json():
+def create_json(game_version='v2.0', workers=1):
+    '''Writes ../{game_version}/move_cards.json, see Card_Engine.'''
+    with Driver(Card_Engine(f'../{game_version}', game_version), root='../', game_version=game_version, workers=workers) as driver:
+        driver.generate_moves()
 
-    template = {
-        "count": "1",
-        "color": "dimgray",
-        "title": "Headbutt",
-        "icon": "white-book-1",
-        "icon_back": "",
-        "contents": [
-        "subtitle | Power {}: {}",
-        "property | Type | Normal",
-        "property | Accuracy | Dexterity + Brawl",
-        "property | Damage | Strength + 3",
-        "property | Added Effect | Roll 3 Chance Dice to Flinch. May call Random Encounters when hitting trees.",
-        "rule",
-        "text | The user strikes the foe with its hard head. Perfect for taking down fruits from trees or shake Pokémon out of their nests on treetops."
-        ],
-        "tags": [],
-        "title_size": "14",
-        "card_font_size": "12"
-    }
-
-    meta = pd.read_csv(io.StringIO(
-"""Type,Color,Icon
-Bug,olive,gold-scarab
-Dark,black,moon
-Dragon,mediumslateblue,spiked-dragon-head
-Electric,gold,electric
-Fairy,pink,sparkles
-Fighting,firebrick,boxing-glove
-Fire,darkorange,fire
-Flying,mediumorchid,fluffy-wing
-Ghost,mediumpurple,spectre
-Grass,limegreen,new-shoot
-Ground,goldenrod,earth-spit
-Ice,paleturquoise,frozen-orb
-Normal,dimgrey,moon-orbit
-Poison,indigo,death-skull
-Psychic,orchid,flower-twirl
-Rock,saddlebrown,rock
-Steel,silver,big-gear
-Water,royalblue,big-wave"""),sep=',').set_index("Type")
-
-    cards = []
-    for fname in sorted(os.listdir(moves_path)):
-        if '.json' not in fname: continue
-        path = moves_path+fname
-        data = json.loads(open(path).read())
-        card = copy.deepcopy(template)
-        card['title'] = data['Name']
-        if data['Type'] in meta.index:
-            card['color'] = meta.loc[data["Type"], 'Color']
-            card['icon'] = meta.loc[data["Type"], 'Icon']
-        card['contents'] = [
-            f"subtitle | Power {data['Power']}: {data['Category']}",
-            f"property | Type | {data['Type']}",
-            f"property | Accuracy | {data['Accuracy1']} + {data['Accuracy2']}",
-            f"property | Damage | {data['Damage1']} + {data['Power']}",
-            f"property | Added Effect | {data['Effect']}",
-            f"rule",
-            f"text | {data['Description']}"
-        ]
-        tags = []
-        for fname in sorted(os.listdir(pokedex_path)):
-            if '.json' not in fname: continue
-            path = pokedex_path+fname
-            dex = json.loads(open(path).read())
-            for move in dex['Moves']:
-                if move['Name'] == data['Name']:
-                    tags.append(dex['Name'].lower())
-        card['tags'] = tags
-        cards.append(card)
-
-
-    open('../Version20/move_cards.json','w').write(json.dumps(cards, indent=4))
-
-def name_fix():
+def name_fix(game_version='v2.0'):
+    moves_path = f'../{game_version}/Moves/'
+    cards_path = f'../{game_version}/Move Cards/'
     for name, card in zip(
             sorted([x for x in os.listdir(moves_path) if '.json' in x]),
-            sorted([x for x in os.listdir('../Version20/Move Cards') if '.png' in x])):
+            sorted([x for x in os.listdir(cards_path) if '.png' in x])):
         
-        move(f'../Version20/Move Cards/{card}',
-             f"../Version20/Move Cards/{name.split('.')[0]}.png")
+        move(f'{cards_path}{card}',
+             f"{cards_path}{name.split('.')[0]}.png")
         
 if __name__ == '__main__':
-  fire.Fire()
\ No newline at end of file
+  fire.Fire()
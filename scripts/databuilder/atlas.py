@@ -0,0 +1,88 @@
+from os.path import join, exists
+from os import listdir, makedirs, remove
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from manifest import file_digest
+from PIL import Image
+import struct
+import json
+
+ATLAS_SIZE = 2048 # Largest sheet edge. Most GPUs and browsers are happy up to 4096.
+
+def png_size(path):
+    '''Width and height straight from a PNG's IHDR chunk, without decoding it.'''
+    header = open(path, 'rb').read(24)
+    return struct.unpack('>II', header[16:24])
+
+def shelf_pack(sizes, max_size=ATLAS_SIZE):
+    '''
+    Lays out (name, width, height) boxes on shelves, tallest first, opening a new sheet when
+    one fills up. Returns a list of sheets, each a dict of name -> (x, y, w, h).
+    '''
+    sheets = [{}]
+    x = y = shelf = 0
+    for name, w, h in sorted(sizes, key=lambda s: (-s[2], -s[1], s[0])):
+        if x + w > max_size:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h > max_size:
+            sheets.append({})
+            x = y = shelf = 0
+        sheets[-1][name] = (x, y, w, h)
+        x += w
+        shelf = max(shelf, h)
+    return sheets
+
+def _compose(job):
+    '''Draws one sheet and writes it out in each requested format. Runs in a worker process.'''
+    path, width, height, sprites, webp = job
+    sheet = Image.new('RGBA', (width, height))
+    for src, (x, y, w, h) in sprites:
+        with Image.open(src) as img:
+            sheet.paste(img.convert('RGBA'), (x, y))
+    sheet.save(path+'.png', optimize=True)
+    if webp: sheet.save(path+'.webp', lossless=True, quality=100, method=6)
+    return path
+
+def build_atlas(source, output, setname, webp=False, workers=None):
+    '''
+    Packs every PNG in source into sprite sheets under output, and writes {setname}.json
+    mapping each sprite's filename (the Pokedex Image field) to its sheet and offset. Sheets are
+    drawn in parallel, and a sheet whose sprites and layout hash the same as the last run's
+    isn't redrawn. Returns the offset map.
+    '''
+    makedirs(output, exist_ok=True)
+    map_path = join(output, f'{setname}.json')
+    previous = json.loads(open(map_path).read()) if exists(map_path) else {'sheets': []}
+    cached = {s['hash']: s for s in previous['sheets']}
+
+    names = sorted(x for x in listdir(source) if x.endswith('.png'))
+    layout = shelf_pack([(n, *png_size(join(source, n))) for n in names])
+    with ProcessPoolExecutor(workers) as pool:
+        digests = dict(zip(names, pool.map(file_digest, [join(source, n) for n in names], chunksize=64)))
+
+        sheets, sprites, jobs = [], {}, []
+        for i, placed in enumerate(layout):
+            width = max(x + w for x, y, w, h in placed.values())
+            height = max(y + h for x, y, w, h in placed.values())
+            digest = blake2b(json.dumps([[n, digests[n], placed[n]] for n in sorted(placed)]).encode(), digest_size=16)
+            sheet = {'file': f'{setname}-{i}.png', 'width': width, 'height': height,
+                     'hash': digest.hexdigest(), 'webp': webp}
+            for name, (x, y, w, h) in placed.items():
+                sprites[name] = {'sheet': i, 'x': x, 'y': y, 'w': w, 'h': h}
+            old = cached.get(sheet['hash'])
+            stem = join(output, f'{setname}-{i}')
+            if (old is None or old['file'] != sheet['file'] or (webp and not old.get('webp'))
+                    or not exists(stem+'.png')):
+                jobs.append((stem, width, height, [(join(source, n), placed[n]) for n in placed], webp))
+            sheets.append(sheet)
+        list(pool.map(_compose, jobs))
+
+    # Sheets left over from a bigger layout
+    for old in previous['sheets'][len(sheets):]:
+        for ext in ['.png', '.webp']:
+            stale = join(output, old['file'][:-4]+ext)
+            if exists(stale): remove(stale)
+
+    atlas = {'set': setname, 'sheets': sheets, 'sprites': sprites}
+    open(map_path, 'w').write(json.dumps(atlas))
+    return atlas
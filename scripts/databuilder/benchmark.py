@@ -0,0 +1,133 @@
+from builder import ENGINES, load_engine
+from catalog import CATEGORIES
+from collections import deque
+from os.path import join, exists, basename, splitext
+from os import makedirs, replace
+from shutil import copy2, rmtree
+from tempfile import mkdtemp
+from glob import glob
+import json
+
+BENCH_FOLDER = '../../.benchmark' # Synthetic datasets and stored baselines, per machine
+SCALED = ['Pokedex', 'Moves']
+THRESHOLD = 1.2 # A stage regresses once it takes this many times its baseline...
+SLACK = 0.05 # ...and at least this many seconds more, so tiny stages don't flap
+ENGINE_ARGS = {'foundry': ('3.348',)}
+
+# # Synthetic datasets
+
+def _copy(entry, i, renamed):
+    '''Copy i of a Pokedex or Moves entry, pointing its learnset and evolutions at copy i too.'''
+    entry = dict(entry, Name=f"{entry['Name']} x{i}", _id=f"{entry.get('_id')}-x{i}")
+    if 'DexID' in entry:
+        entry['DexID'] = f"{entry['DexID']}-x{i}"
+        entry['Moves'] = [dict(m, Name=f"{m['Name']} x{i}") for m in entry.get('Moves', [])]
+        entry['Evolutions'] = [{k: (f'{v} x{i}' if k in ('To', 'From') and v in renamed else v)
+                                for k, v in evo.items()} for evo in entry.get('Evolutions', [])]
+    return entry
+
+def synthesize(scale, root='../../', game_version='v3.0', folder=BENCH_FOLDER):
+    '''
+    game_version with scale times as many Pokedex and Moves entries, in folder/x{scale}.
+    Copy i of each Pokemon learns copy i of its moves and evolves into copy i of its
+    evolutions, so learnset fan-out per move matches the real data while the record count
+    grows. Abilities, Items and Natures are the real ones. Returns the new dataset root.
+    '''
+    target = join(folder, f'x{scale}')
+    done = join(target, game_version, '.complete')
+    if exists(done): return target
+    if exists(target): rmtree(target)
+    for category in CATEGORIES:
+        out = join(target, game_version, category)
+        makedirs(out)
+        srcs = sorted(glob(join(root, game_version, category, '*.json')))
+        renamed = {json.loads(open(s).read()).get('Name') for s in srcs} | {splitext(basename(s))[0] for s in srcs}
+        for src in srcs:
+            copy2(src, out)
+            if category not in SCALED: continue
+            stem, entry = splitext(basename(src))[0], json.loads(open(src).read())
+            for i in range(1, scale):
+                with open(join(out, f'{stem} x{i}.json'), 'w') as f:
+                    f.write(json.dumps(_copy(entry, i, renamed), indent=4))
+    open(done, 'w').close()
+    return target
+
+# # Timing
+
+def _time_engine(name, root, game_version, workers):
+    '''Seconds per stage for one full build with engine name, plus closing (final writes).'''
+    from driver import Driver
+    output = mkdtemp(prefix=f'benchmark-{name}-')
+    try:
+        engine = load_engine(name)(output, game_version, *ENGINE_ARGS.get(name, ()))
+        driver = Driver(engine, root=root, workers=workers)
+        for stage in ENGINES[name][2]:
+            deque(getattr(driver, f'iter_{stage}')(), maxlen=0)
+        driver.close()
+        return {stage.lower(): timing['seconds'] for stage, timing in driver.instruments.stages.items()}
+    finally:
+        rmtree(output, ignore_errors=True)
+
+def run(scales=(1, 10, 100), engines=tuple(ENGINES), root='../../', game_version='v3.0', workers=1, repeat=3):
+    '''
+    Best of repeat builds (one at x100) for every engine at every scale (1 is the real dataset), as
+    {"engine/x{scale}/stage": seconds}.
+    '''
+    results = {}
+    for scale in scales:
+        source = root if scale == 1 else synthesize(scale, root, game_version)
+        for name in engines:
+            for _ in range(repeat if scale < 100 else 1):
+                for stage, seconds in _time_engine(name, source, game_version, workers).items():
+                    key = f'{name}/x{scale}/{stage}'
+                    results[key] = min(results.get(key, seconds), seconds)
+                    print(f'{key:32} {results[key]:8.3f}s', flush=True)
+    return results
+
+# # Baselines
+
+def _baseline_path(folder=BENCH_FOLDER):
+    return join(folder, 'baseline.json')
+
+def save(results, folder=BENCH_FOLDER):
+    '''Merges results into the stored baseline.'''
+    makedirs(folder, exist_ok=True)
+    path = _baseline_path(folder)
+    baseline = json.loads(open(path).read()) if exists(path) else {}
+    baseline.update(results)
+    open(path+'.tmp', 'w').write(json.dumps(baseline, indent=4, sort_keys=True))
+    replace(path+'.tmp', path)
+
+def compare(results, folder=BENCH_FOLDER, threshold=THRESHOLD, slack=SLACK):
+    '''The stages in results that got slower than the stored baseline allows, as key -> (baseline, now).'''
+    path = _baseline_path(folder)
+    if not exists(path): raise Exception(f"ERROR: No baseline at {path}, run with --save first!")
+    baseline = json.loads(open(path).read())
+    return {key: (baseline[key], seconds) for key, seconds in results.items()
+            if key in baseline and seconds > baseline[key]*threshold and seconds-baseline[key] > slack}
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Times every engine stage on the real dataset and on scaled synthetic copies.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--game-version', default='v3.0')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many builds (once at x100)')
+    parser.add_argument('--save', action='store_true', help='store these timings as the baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.engines, game_version=args.game_version, workers=args.workers, repeat=args.repeat)
+    if args.save:
+        save(results)
+        print(f'Saved {len(results)} timings to {_baseline_path()}')
+        return
+    regressions = compare(results, threshold=args.threshold)
+    for key, (before, now) in regressions.items():
+        print(f'REGRESSION {key}: {before:.3f}s -> {now:.3f}s')
+    if regressions: raise SystemExit(1)
+    print('No regressions')
+
+if __name__ == '__main__':
+  main()
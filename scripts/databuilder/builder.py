@@ -1,32 +1,241 @@
-from srd_engine import SRD_Engine
-from foundry_engine import Foundry_Engine
-from driver import Driver
-from fire import Fire
+import time
+STARTED = time.perf_counter()
+
+from importlib import import_module
+from collections import deque
+from os.path import join
+import argparse
 
 SRD_FOLDER = '' # The SRD will be placed in a "Pokerole SRD" in this folder.
 GAME_VERSION = 'v3.0' # Or make it 'v2.0'
+FOUNDRY_FOLDER = '../../FoundryModule'
+
+# Engines are only imported once a build asks for them, so a Foundry build never loads the SRD
+# side and --help loads nothing. name: (module, class, stages, image sets)
+ENGINES = {
+    'srd': ('srd_engine', 'SRD_Engine', ['abilities', 'moves', 'items', 'pokedex', 'natures'],
+            ['BookSprites', 'HomeSprites', "ItemSprites"]),
+    'foundry': ('foundry_engine', 'Foundry_Engine', ['abilities', 'moves', 'items', 'pokedex'],
+                ['BookSprites', "ItemSprites"]),
+    'sqlite': ('sqlite_engine', 'SQLite_Engine', ['abilities', 'moves', 'items', 'pokedex', 'natures'], []),
+    'cards': ('card_engine', 'Card_Engine', ['moves'], []),
+}
+
+def load_engine(name):
+    module, cls = ENGINES[name][:2]
+    return getattr(import_module(module), cls)
+
+def foundry_folder(game_version):
+    '''
+    Where `all` puts a version's Foundry module. Modules have one set of packs each, so when
+    several versions are built at once, versions other than GAME_VERSION get their own folder.
+    '''
+    return FOUNDRY_FOLDER if game_version == GAME_VERSION else f'{FOUNDRY_FOLDER}-{game_version}'
+
+def make_engine(name, game_version, output_folder=None, clean=True):
+    '''An engine by name, writing to output_folder or to where that engine's output goes by default.'''
+    if name == 'srd': return load_engine('srd')(output_folder or SRD_FOLDER, game_version, clean=clean)
+    if name == 'foundry': return load_engine('foundry')(output_folder or FOUNDRY_FOLDER, game_version, '3.348', clean=clean)
+    if name == 'sqlite': return load_engine('sqlite')(output_folder or '../../', game_version, clean=clean)
+    return load_engine('cards')(output_folder or join('../../', game_version), game_version)
+
+def _driver(engine, **kwargs):
+    from driver import Driver
+    return Driver(engine, **kwargs)
+
+def _run(driver, stages, lazy):
+    '''Runs each stage. Lazy runs stream records straight to the engine and keep none of them.'''
+    for stage in stages:
+        if lazy: deque(getattr(driver, f'iter_{stage}')(), maxlen=0)
+        else: getattr(driver, f'generate_{stage}')()
+
+def buildSRD(game_version, srd_folder, workers=1, lazy=True, incremental=False, hardlink_images=False, bundle=None,
+             report=None, profile=None, overlays=()):
+    srd = load_engine('srd')(srd_folder, game_version, clean=not incremental)
+    srd.hardlink_images = hardlink_images
+    with _driver(srd, workers=workers, incremental=incremental, bundle=bundle, report=report, profile=profile,
+                 overlays=overlays) as driver:
+        _run(driver, ENGINES['srd'][2], lazy)
+        driver.generate_images(ENGINES['srd'][3])
+
+def buildFoundry(game_version, foundry_version='3.348', workers=1, lazy=True, incremental=False, hardlink_images=False, bundle=None,
+                 report=None, profile=None, overlays=(), shared_items=False, compress=None):
+    '''Foundry module packs and sprites. See Foundry_Engine for shared_items and compress.'''
+    fndry = load_engine('foundry')(FOUNDRY_FOLDER, game_version, foundry_version, clean=not incremental,
+                                   shared_items=shared_items, compress=compress)
+    fndry.hardlink_images = hardlink_images
+    with _driver(fndry, workers=workers, incremental=incremental, bundle=bundle, report=report, profile=profile,
+                 overlays=overlays) as driver:
+        _run(driver, ENGINES['foundry'][2], lazy)
+        driver.generate_images(ENGINES['foundry'][3])
+
+def buildSQLite(game_version, output_folder='../../', workers=1, incremental=False, bundle=None, report=None, profile=None,
+                overlays=()):
+    '''A pokerole-{game_version}.sqlite database in output_folder.'''
+    sql = load_engine('sqlite')(output_folder, game_version, clean=not incremental)
+    with _driver(sql, workers=workers, incremental=incremental, bundle=bundle, report=report, profile=profile,
+                 overlays=overlays) as driver:
+        _run(driver, ENGINES['sqlite'][2], True)
+
+def buildCards(game_version, output_folder=None, workers=1, report=None, profile=None, overlays=()):
+    '''move_cards.json for game_version, written next to its data unless output_folder says otherwise.'''
+    cards = load_engine('cards')(output_folder or join('../../', game_version), game_version)
+    with _driver(cards, workers=workers, report=report, profile=profile, overlays=overlays) as driver:
+        _run(driver, ENGINES['cards'][2], True)
+
+def buildImages(engine, game_version, output_folder=None, sets=None, hardlink_images=False, report=None, profile=None):
+    '''Syncs an engine's image sets (or just sets) without rebuilding any records.'''
+    target = make_engine(engine, game_version, output_folder, clean=False)
+    target.hardlink_images = hardlink_images
+    with _driver(target, report=report, profile=profile) as driver:
+        # No records are built, so the last build's manifest stays as it is
+        driver.manifest = None
+        driver.generate_images(sets or ENGINES[engine][3])
+
+def buildWatch(engine, game_version, output_folder=None, polling=False, debounce=0.15, overlays=()):
+    '''Keeps an engine's output up to date while the dataset is being edited. See watch.watch.'''
+    from watch import watch
+    target = make_engine(engine, game_version, output_folder, clean=False)
+    watch(target, ENGINES[engine][2], polling=polling, debounce=debounce, overlays=overlays)
+
+def buildAll(game_versions, engines=('srd', 'foundry'), workers=None, incremental=False, hardlink_images=False,
+             report=None, overlays=()):
+    '''
+    Every engine for every game version at once, sharing one read of each version. See
+    multibuild.build_all. Foundry modules go to foundry_folder when there's more than one version.
+    '''
+    from multibuild import build_all
+    several = len(set(game_versions)) > 1
+    jobs = []
+    for game_version in game_versions:
+        for name in engines:
+            output = foundry_folder(game_version) if name == 'foundry' and several else None
+            engine = make_engine(name, game_version, output, clean=not incremental)
+            engine.hardlink_images = hardlink_images
+            jobs.append((game_version, name, engine, ENGINES[name][2], ENGINES[name][3]))
+    return build_all(jobs, workers=workers, incremental=incremental, overlays=overlays, report=report)
+
+def buildBundle(game_version, homebrew=False, output=None):
+    '''Compiles game_version (and Homebrew, if asked) into one bundle file for --bundle builds. See bundle.compile_bundle.'''
+    from bundle import compile_bundle
+    path = compile_bundle('../../', game_version, homebrew, output)
+    print(f'Compiled {path}')
+    return path
+
+def buildAtlases(output_folder='../../atlases', sets=['BoxSprites', 'ShuffleTokens'], webp=False, report=None, profile=None):
+    '''Sprite sheets plus offset maps for the small sprite sets, in output_folder/atlases.'''
+    from engine import Engine
+    with _driver(Engine(output_folder, GAME_VERSION), report=report, profile=profile) as driver:
+        driver.generate_atlases(sets, webp)
+
+# # Command line
+
+def _parser():
+    parser = argparse.ArgumentParser(description='Builds the Pokerole dataset into its output formats.')
+    parser.add_argument('--timing', action='store_true', help='print startup and build times')
+    parser.add_argument('--report', metavar='PATH', help='write stage timings, I/O counters and warnings here as JSON')
+    parser.add_argument('--profile', metavar='DIR', help='run each stage under cProfile and dump the stats here')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    def layers(sub):
+        sub.add_argument('--homebrew', action='store_true', help='lay the Homebrew folder over the core records')
+        sub.add_argument('--overlay', action='append', default=[], metavar='DIR',
+                         help='lay another dataset folder (relative to the root) over them, repeatable')
+
+    def command(name, help, records=True, engine=False):
+        sub = commands.add_parser(name, help=help)
+        if engine: sub.add_argument('engine', choices=['srd', 'foundry'])
+        sub.add_argument('game_version', nargs='?', default=GAME_VERSION)
+        if not engine: layers(sub)
+        if records:
+            sub.add_argument('--workers', type=int, default=1, help='worker processes for record conversion')
+            sub.add_argument('--incremental', action='store_true', help='only rebuild what changed since the last build')
+            sub.add_argument('--bundle', help='read records from a compiled dataset bundle')
+        return sub
+
+    srd = command('srd', 'Obsidian SRD vault pages and sprites')
+    srd.add_argument('srd_folder', nargs='?', default=SRD_FOLDER)
+    srd.add_argument('--eager', action='store_true', help='keep every converted record in memory')
+    srd.add_argument('--hardlink-images', action='store_true')
+
+    foundry = command('foundry', 'Foundry VTT module packs and sprites')
+    foundry.add_argument('--foundry-version', default='3.348')
+    foundry.add_argument('--eager', action='store_true', help='keep every converted record in memory')
+    foundry.add_argument('--hardlink-images', action='store_true')
+    foundry.add_argument('--shared-items', action='store_true',
+                         help="refer to moves and abilities in Pokemon instead of embedding them (see packs.py)")
+    foundry.add_argument('--compress', choices=['gzip', 'zstd'], help='also write a compressed copy of each pack')
+
+    sqlite = command('sqlite', 'a pokerole-{version}.sqlite database')
+    sqlite.add_argument('--output-folder', default='../../')
+
+    cards = command('cards', 'move_cards.json for the RPG Cards generator', records=False)
+    cards.add_argument('--output-folder')
+    cards.add_argument('--workers', type=int, default=1)
+
+    images = command('images', "sync an engine's image sets only", records=False, engine=True)
+    images.add_argument('--output-folder')
+    images.add_argument('--sets', nargs='+')
+    images.add_argument('--hardlink-images', action='store_true')
 
+    watch = commands.add_parser('watch', help="rebuild an engine's changed records as they're saved")
+    watch.add_argument('engine', choices=['srd', 'foundry', 'sqlite'])
+    watch.add_argument('game_version', nargs='?', default=GAME_VERSION)
+    watch.add_argument('--output-folder')
+    watch.add_argument('--polling', action='store_true', help='poll for changes instead of using inotify')
+    watch.add_argument('--debounce', type=float, default=0.15, help='seconds of quiet before a rebuild')
+    layers(watch)
 
-def buildSRD(game_version, srd_folder):
-    srd = SRD_Engine(srd_folder, game_version)
-    driver = Driver(srd)
+    every = commands.add_parser('all', help='several engines for several game versions at once')
+    every.add_argument('game_versions', nargs='*', default=['v2.0', 'v3.0'])
+    every.add_argument('--engines', nargs='+', choices=list(ENGINES), default=['srd', 'foundry'])
+    every.add_argument('--workers', type=int, help='builds run at once, every core by default')
+    every.add_argument('--incremental', action='store_true', help='only rebuild what changed since the last build')
+    every.add_argument('--hardlink-images', action='store_true')
+    layers(every)
 
-    driver.generate_abilities()
-    driver.generate_moves()
-    driver.generate_items()
-    driver.generate_pokedex()
-    driver.generate_natures()
-    driver.generate_images(['BookSprites', 'HomeSprites', "ItemSprites"])
+    bundle = commands.add_parser('compile', help='compile a game version into a dataset bundle for --bundle')
+    bundle.add_argument('game_version', nargs='?', default=GAME_VERSION)
+    bundle.add_argument('--homebrew', action='store_true', help='include the Homebrew records, which win _id lookups')
+    bundle.add_argument('--output', help='the bundle file, {game_version}.bundle (or {game_version}+homebrew.bundle) in the dataset root by default')
 
-def buildFoundry(game_version, foundry_version='3.348'):
-    fndry = Foundry_Engine('../../FoundryModule', game_version, foundry_version)
-    driver = Driver(fndry)
+    atlases = commands.add_parser('atlases', help='sprite sheets for the small sprite sets')
+    atlases.add_argument('--output-folder', default='../../atlases')
+    atlases.add_argument('--sets', nargs='+', default=['BoxSprites', 'ShuffleTokens'])
+    atlases.add_argument('--webp', action='store_true')
+    return parser
 
-    driver.generate_abilities()
-    driver.generate_moves()
-    driver.generate_items()
-    driver.generate_pokedex()
-    driver.generate_images(['BookSprites', "ItemSprites"])
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    if args.timing: print(f'startup: {(time.perf_counter()-STARTED)*1000:.1f}ms')
+    instruments = {'report': args.report, 'profile': args.profile}
+    overlays = (['Homebrew'] if args.homebrew else []) + args.overlay if 'overlay' in args else []
+    if args.command == 'srd':
+        buildSRD(args.game_version, args.srd_folder, args.workers, not args.eager, args.incremental,
+                 args.hardlink_images, args.bundle, overlays=overlays, **instruments)
+    elif args.command == 'foundry':
+        buildFoundry(args.game_version, args.foundry_version, args.workers, not args.eager, args.incremental,
+                     args.hardlink_images, args.bundle, overlays=overlays, shared_items=args.shared_items,
+                     compress=args.compress, **instruments)
+    elif args.command == 'sqlite':
+        buildSQLite(args.game_version, args.output_folder, args.workers, args.incremental, args.bundle, overlays=overlays, **instruments)
+    elif args.command == 'cards':
+        buildCards(args.game_version, args.output_folder, args.workers, overlays=overlays, **instruments)
+    elif args.command == 'images':
+        buildImages(args.engine, args.game_version, args.output_folder, args.sets, args.hardlink_images, **instruments)
+    elif args.command == 'watch':
+        buildWatch(args.engine, args.game_version, args.output_folder, args.polling, args.debounce, overlays)
+    elif args.command == 'all':
+        buildAll(args.game_versions, args.engines, args.workers, args.incremental, args.hardlink_images,
+                 args.report, overlays)
+    elif args.command == 'compile':
+        buildBundle(args.game_version, args.homebrew, args.output)
+    elif args.command == 'atlases':
+        buildAtlases(args.output_folder, args.sets, args.webp, **instruments)
+    else:
+        _parser().print_help()
+        return
+    if args.timing: print(f'{args.command}: {time.perf_counter()-STARTED:.2f}s')
 
 if __name__ == '__main__':
-  Fire()
\ No newline at end of file
+  main()
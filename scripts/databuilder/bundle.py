@@ -0,0 +1,101 @@
+from os.path import join, isdir, relpath
+from catalog import CATEGORIES
+from mmap import mmap, ACCESS_READ
+from glob import glob
+import struct
+import json
+
+MAGIC = b'PKRBNDL1'
+HEADER = struct.Struct('<8sQ') # magic, index length
+
+class Bundle(object):
+    '''
+    A whole game version compiled into one file: a header, a JSON index, then every record as
+    compact JSON. The index holds each record's source path, offset and length, plus _id and
+    DexID tables, so a record is one slice of the memory mapped file away.
+
+    Source paths are relative to the dataset root, e.g. v3.0/Moves/Absorb.json.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+        magic, size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC: raise Exception(f"ERROR: {path} is not a dataset bundle!")
+        index = json.loads(self._map[HEADER.size:HEADER.size+size])
+        self.game_version = index['game_version']
+        self.homebrew = index['homebrew']
+        self._base = HEADER.size + size
+        self._paths = index['paths']
+        self._ids = index['ids']
+        self._dexids = index['dexids']
+
+    def _open(self):
+        self._file = open(self.path, 'rb')
+        self._map = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+
+    def __getstate__(self):
+        # The file and its mapping stay with the process that opened them; the index travels
+        state = dict(self.__dict__)
+        del state['_file'], state['_map']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def paths(self, category):
+        return list(self._paths[category])
+
+    def read(self, src):
+        category = src.split('/')[-2]
+        offset, length = self._paths[category][src]
+        start = self._base + offset
+        return json.loads(self._map[start:start+length])
+
+    def get_id(self, category, _id):
+        src = self._ids[category].get(_id)
+        return self.read(src) if src else None
+
+    def get_dexid(self, dexid):
+        src = self._dexids.get(dexid)
+        return self.read(src) if src else None
+
+def _sources(root, game_version, homebrew):
+    for category in CATEGORIES:
+        folders = [join(root, game_version, category)]
+        if homebrew: folders.append(join(root, 'Homebrew', category))
+        for folder in [f for f in folders if isdir(f)]:
+            for src in sorted(glob(join(folder, '*.json'))):
+                yield category, src
+
+def compile_bundle(root='../../', game_version='v3.0', homebrew=False, output=None):
+    '''
+    Packs game_version (and Homebrew, if asked) into a single bundle file. Homebrew records
+    come after the core ones and win _id lookups.
+    '''
+    output = output or join(root, f'{game_version}{"+homebrew" if homebrew else ""}.bundle')
+    blobs, offset = [], 0
+    paths = {c: {} for c in CATEGORIES}
+    ids = {c: {} for c in CATEGORIES}
+    dexids = {}
+    for category, src in _sources(root, game_version, homebrew):
+        entry = json.loads(open(src).read())
+        blob = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        key = relpath(src, root).replace('\\', '/')
+        paths[category][key] = [offset, len(blob)]
+        ids[category][entry.get('_id')] = key
+        if entry.get('DexID'): dexids.setdefault(entry['DexID'], key)
+        blobs.append(blob)
+        offset += len(blob)
+    index = json.dumps({'game_version': game_version, 'homebrew': homebrew, 'paths': paths,
+                        'ids': ids, 'dexids': dexids}, ensure_ascii=False).encode('utf-8')
+    with open(output, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(index)))
+        out.write(index)
+        out.writelines(blobs)
+    return output
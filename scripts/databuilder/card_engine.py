@@ -0,0 +1,121 @@
+from engine import Engine
+from os.path import join
+from os import makedirs, replace, remove
+from copy import deepcopy
+import json
+
+# Card color and game-icons.net icon per move type
+TYPE_STYLES = {
+    'Bug': ('olive', 'gold-scarab'),
+    'Dark': ('black', 'moon'),
+    'Dragon': ('mediumslateblue', 'spiked-dragon-head'),
+    'Electric': ('gold', 'electric'),
+    'Fairy': ('pink', 'sparkles'),
+    'Fighting': ('firebrick', 'boxing-glove'),
+    'Fire': ('darkorange', 'fire'),
+    'Flying': ('mediumorchid', 'fluffy-wing'),
+    'Ghost': ('mediumpurple', 'spectre'),
+    'Grass': ('limegreen', 'new-shoot'),
+    'Ground': ('goldenrod', 'earth-spit'),
+    'Ice': ('paleturquoise', 'frozen-orb'),
+    'Normal': ('dimgrey', 'moon-orbit'),
+    'Poison': ('indigo', 'death-skull'),
+    'Psychic': ('orchid', 'flower-twirl'),
+    'Rock': ('saddlebrown', 'rock'),
+    'Steel': ('silver', 'big-gear'),
+    'Water': ('royalblue', 'big-wave'),
+}
+
+CARD_TEMPLATE = {
+    "count": "1",
+    "color": "dimgray",
+    "title": "",
+    "icon": "white-book-1",
+    "icon_back": "",
+    "contents": [],
+    "tags": [],
+    "title_size": "14",
+    "card_font_size": "12"
+}
+
+class Card_Engine(Engine):
+    '''
+    Move cards for the RPG Cards generator, one per move, tagged with every Pokemon that
+    learns it. Writes move_cards.json into output_path, card by card as moves come in.
+
+    Cards are a single file built in one go, so they aren't tracked for incremental builds.
+    '''
+
+    TRACKED = False
+
+    def __init__(self, output_path, game_version):
+        super().__init__(output_path, game_version)
+        self.cards_path = join(output_path, 'move_cards.json')
+        self._learners = None
+        self._out = None
+
+    def prepare(self):
+        self.learners()
+
+    def learners(self):
+        '''Move Name -> lowercased names of the Pokemon that learn it, built in one pass over the Pokedex.'''
+        if self._learners is None:
+            catalog = self.driver.catalog
+            resolved, learners = {}, {}
+            for _, dex in catalog.entries('Pokedex'):
+                for move in dex['Moves']:
+                    # Learnsets name moves by file, cards go by the move's Name field
+                    name = move['Name']
+                    if name not in resolved:
+                        found = catalog.get('Moves', name)
+                        resolved[name] = found['Name'] if found else name
+                    learners.setdefault(resolved[name], []).append(dex['Name'].lower())
+            self._learners = learners
+        return self._learners
+
+    def movedex_entry(self, entry, write=True):
+        card = deepcopy(CARD_TEMPLATE)
+        card['title'] = entry['Name']
+        if entry['Type'] in TYPE_STYLES:
+            card['color'], card['icon'] = TYPE_STYLES[entry['Type']]
+        card['contents'] = [
+            f"subtitle | Power {entry['Power']}: {entry['Category']}",
+            f"property | Type | {entry['Type']}",
+            f"property | Accuracy | {entry['Accuracy1']} + {entry['Accuracy2']}",
+            f"property | Damage | {entry['Damage1']} + {entry['Power']}",
+            f"property | Added Effect | {entry['Effect']}",
+            "rule",
+            f"text | {entry['Description']}"
+        ]
+        card['tags'] = list(self.learners().get(entry['Name'], []))
+        if write: self._write_card(json.dumps(card, indent=4))
+        return card
+
+    def _write_card(self, text):
+        '''Appends one card to the open JSON list, matching json.dumps(cards, indent=4).'''
+        if self._deferred is not None:
+            self._deferred.append(('_write_card', (text,)))
+            return
+        if self._out is None:
+            makedirs(self.output_path, exist_ok=True)
+            self._out = open(self.cards_path+'.tmp', 'w')
+            self._out.write('[\n')
+        else:
+            self._out.write(',\n')
+        self._out.write('    '+text.replace('\n', '\n    '))
+        self._count('cards_written')
+
+    def close(self):
+        super().close()
+        if self._out is None: return
+        self._out.write('\n]')
+        self._out.close()
+        self._out = None
+        replace(self.cards_path+'.tmp', self.cards_path)
+
+    def abort(self):
+        super().abort()
+        if self._out is None: return
+        self._out.close()
+        self._out = None
+        remove(self.cards_path+'.tmp')
@@ -0,0 +1,181 @@
+from os.path import join, basename, dirname, splitext, normpath
+from fnmatch import fnmatch
+from glob import glob
+from records import parse
+import json
+
+CATEGORIES = ['Pokedex', 'Moves', 'Abilities', 'Items', 'Natures']
+# Learnset and RecommendedRank ranks, lowest first
+RANKS = {
+    'v2.0': ['Starter', 'Beginner', 'Amateur', 'Ace', 'Pro', 'Master'],
+    'v3.0': ['Starter', 'Rookie', 'Standard', 'Advanced', 'Expert', 'Ace', 'Master', 'Champion'],
+}
+
+class Catalog(object):
+    '''
+    An in memory index of the dataset. Each category is read from disk once, the first time
+    it's asked for, and then served from name and _id keyed indexes. Entries are read only
+    records (see records.Record), parsed once and handed out as they are, never copied.
+    Engines that need a dict to change call entry.to_dict().
+    
+    Overlays are more dataset folders laid over root/game_version, like Homebrew or a table's
+    private folder, each holding the same category folders. Layers are merged by _id, later
+    ones winning, so an overlay record replaces the core record with its _id and any others
+    are added. Nothing is copied. Which layer each record came from, with its Source and
+    Author, is kept in a side table (see provenance). Given the Manifest of an earlier build,
+    files it shows unchanged aren't read to be merged, their _id comes from the manifest.
+    
+    Given a Bundle, records are read from it instead of the directory tree, and its own layers
+    (Homebrew, if it was compiled with it) are merged the same way. Given Instruments, file 
+    reads and cache hits are counted.
+    '''
+
+    def __init__(self, root, game_version, bundle=None, instruments=None, overlays=()):
+        self.root = root
+        self.game_version = game_version
+        self.bundle = bundle
+        self.instruments = instruments
+        if bundle and overlays: raise Exception("ERROR: Bundles carry their own layers, overlays can't be added to one!")
+        # (name, folder) per layer, lowest precedence first. Overlays are relative to root.
+        self.layers = [(game_version, join(root, game_version))] + \
+                      [(basename(normpath(o)), join(root, o)) for o in overlays]
+        self.manifest = None
+        self._winners = {}
+        self._provenance = {}
+        self._entries = {}
+        self._names = {}
+        self._ids = {}
+        self._files = {}
+        self._evolutions = None
+
+    def _read(self, src):
+        entry = self._files.get(src)
+        if entry is None:
+            if self.bundle: entry = self.bundle.read(src)
+            else:
+                data = open(src, 'rb').read()
+                entry = json.loads(data)
+                if self.instruments:
+                    self.instruments.count('files_read')
+                    self.instruments.count('bytes_read', len(data))
+            # Sources sit in their category's folder, in bundles too
+            entry = self._files[src] = parse(basename(dirname(src)), entry)
+            if self.instruments: self.instruments.count('catalog_misses')
+        elif self.instruments: self.instruments.count('catalog_hits')
+        return entry
+
+    def _sources(self, category):
+        '''(layer, path) for every file in category, lowest precedence first.'''
+        if self.bundle: return [(src.split('/')[0], src) for src in self.bundle.paths(category)]
+        return [(layer, src) for layer, folder in self.layers for src in sorted(glob(join(folder, category, '*.json')))]
+
+    def _id(self, src):
+        '''A source's _id, from the manifest while the file is unchanged, from the file otherwise.'''
+        if self.manifest and src not in self._files and src in self.manifest.sources and not self.manifest.changed(src):
+            return self.manifest.sources[src]['_id']
+        return self._read(src).get('_id')
+
+    def _merge(self, category):
+        '''The source that wins each _id in category, after reading every layer's files (or manifest entries) once.'''
+        if category in self._winners: return self._winners[category]
+        winners = {}
+        for layer, src in self._sources(category):
+            key = self._id(src) or splitext(basename(src))[0]
+            below = winners.get(key)
+            if below and below['layer'] == layer:
+                # A few core records share an _id (see engine.pack_key). Only a higher layer replaces one.
+                key = (key, src)
+                below = None
+            # Replacing a key keeps its place, so overridden records stay where they were
+            winners[key] = {'layer': layer, 'path': src, 'overrides': [below['path']] + below['overrides'] if below else []}
+        self._provenance[category] = winners
+        self._winners[category] = [w['path'] for w in winners.values()]
+        return self._winners[category]
+
+    def _load(self, category):
+        if category in self._entries: return
+        entries, stems, names, ids = {}, {}, {}, {}
+        for src in self.paths(category):
+            entry = self._read(src)
+            entries[src] = entry
+            stems[splitext(basename(src))[0]] = entry
+            names.setdefault(entry.get('Name'), entry)
+            ids.setdefault(entry.get('_id'), entry)
+        # Files are named after their entry, but a few names don't survive as filenames
+        # (Type: Null, Struggle (Physical)), so the filename wins when they disagree.
+        names.update(stems)
+        self._entries[category] = entries
+        self._names[category] = names
+        self._ids[category] = ids
+
+    def invalidate(self, paths=None):
+        '''
+        Forgets the given source files (or every file), so they're read again the next time
+        they're needed. Category indexes are rebuilt on their next use, from the files still cached.
+        '''
+        if paths is None: self._files = {}
+        for src in paths or []: self._files.pop(src, None)
+        self._entries, self._names, self._ids = {}, {}, {}
+        self._winners, self._provenance = {}, {}
+        self._evolutions = None
+
+    def load_all(self):
+        for category in CATEGORIES:
+            self._load(category)
+        return self
+
+    def paths(self, category, file_match='*.json'):
+        '''
+        Source files for a category. A single layer is listed without reading anything, layers
+        have to be read to be merged (once, the files are cached).
+        '''
+        if len(self.layers) > 1 or (self.bundle and self.bundle.homebrew):
+            return [src for src in self._merge(category) if fnmatch(basename(src), file_match)]
+        if self.bundle:
+            return [src for src in self.bundle.paths(category) if fnmatch(basename(src), file_match)]
+        return sorted(glob(join(self.root, self.game_version, category, file_match)))
+
+    def provenance(self, category, _id):
+        '''
+        Where the record with _id comes from: its layer and path, its Source (Core X.0 for core
+        records) and Author, and the paths of the records it overrides in lower layers.
+        '''
+        self._merge(category)
+        found = self._provenance[category].get(_id)
+        if not found: return None
+        entry = self._read(found['path'])
+        return dict(found, Source=entry.get('Source') or (f'Core {self.game_version[1:]}' if found['layer'] == self.game_version else found['layer']),
+                    Author=entry.get('Author'))
+
+    def read(self, src):
+        '''The entry stored in a single source file. Only that file is read.'''
+        return self._read(src)
+
+    def entries(self, category, file_match='*.json'):
+        '''Yields (source path, entry) for each file in a category that matches file_match.'''
+        self._load(category)
+        for src, entry in self._entries[category].items():
+            if fnmatch(basename(src), file_match):
+                yield src, entry
+
+    def get(self, category, name):
+        '''Returns the entry with the given Name (or filename, sans .json), or None.'''
+        self._load(category)
+        return self._names[category].get(name)
+
+    def get_id(self, category, _id):
+        '''Returns the entry with the given _id, or None.'''
+        self._load(category)
+        return self._ids[category].get(_id)
+
+    def evolutions(self):
+        '''The Pokedex's evolution.EvolutionGraph, built the first time it's asked for.'''
+        if self._evolutions is None:
+            from evolution import EvolutionGraph
+            self._load('Pokedex')
+            self._evolutions = EvolutionGraph(self._entries['Pokedex'].items())
+        return self._evolutions
+
+    def names(self, category):
+        self._load(category)
+        return list(self._names[category])
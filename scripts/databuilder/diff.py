@@ -0,0 +1,155 @@
+from catalog import CATEGORIES
+from os.path import join, basename, isdir
+from os import replace
+from collections import Counter
+from hashlib import blake2b
+from glob import glob
+import json
+import sys
+
+FEED_VERSION = 1
+
+def _digest(data):
+    return blake2b(data, digest_size=16).hexdigest()
+
+def _canonical(entry):
+    return json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _folders(root, game_version, homebrew):
+    folders = {c: join(root, game_version, c) for c in CATEGORIES}
+    if homebrew: folders.update({f'Homebrew/{c}': join(root, 'Homebrew', c) for c in CATEGORIES})
+    return {c: f for c, f in folders.items() if isdir(f)}
+
+def _files(folder):
+    '''file name: raw bytes, for every record in folder.'''
+    return {basename(src): open(src, 'rb').read() for src in sorted(glob(join(folder, '*.json')))}
+
+def key_of(category, entry):
+    '''What identifies a record across revisions: DexID for Pokemon, _id for everything else.'''
+    if category == 'Pokedex': return entry.get('DexID') or entry.get('_id')
+    return entry.get('_id')
+
+def _keyed(category, entries, shared):
+    '''key: entry. Keys that more than one record uses, on either side, get the Name added.'''
+    return {(key_of(category, e), e.get('Name')) if key_of(category, e) in shared else key_of(category, e): e
+            for e in entries}
+
+# # Field level patches, as JSON Patch (RFC 6902) operations
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+def patch(old, new, path=''):
+    '''
+    JSON Patch operations that turn old into new. Objects are compared key by key and lists
+    of the same length item by item; anything else that differs is replaced whole.
+    '''
+    if type(old) is not type(new) or not isinstance(old, (dict, list)):
+        return [] if old == new and type(old) is type(new) else [{'op': 'replace', 'path': path, 'value': new}]
+    ops = []
+    if isinstance(old, dict):
+        for key in old:
+            if key not in new: ops.append({'op': 'remove', 'path': _pointer(path, key)})
+            elif old[key] != new[key] or type(old[key]) is not type(new[key]):
+                ops += patch(old[key], new[key], _pointer(path, key))
+        for key in new:
+            if key not in old: ops.append({'op': 'add', 'path': _pointer(path, key), 'value': new[key]})
+    elif len(old) != len(new):
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+    else:
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b or type(a) is not type(b): ops += patch(a, b, _pointer(path, i))
+    return ops
+
+def apply(entry, ops):
+    '''Applies patch operations to entry in place and returns it, for consumers and for checking feeds.'''
+    for op in ops:
+        parts = [p.replace('~1', '/').replace('~0', '~') for p in op['path'].split('/')[1:]]
+        if not parts:
+            entry = op['value']
+            continue
+        target = entry
+        for part in parts[:-1]:
+            target = target[int(part) if isinstance(target, list) else part]
+        last = int(parts[-1]) if isinstance(target, list) else parts[-1]
+        if op['op'] == 'remove': del target[last]
+        else: target[last] = op['value']
+    return entry
+
+# # Comparing two dataset revisions
+
+def diff(old_root, new_root, old_version='v3.0', new_version=None, homebrew=True):
+    '''
+    Yields a change for every record that was added, removed or modified between two dataset
+    roots (two checkouts, or one root and two game versions). Records are matched by key_of.
+    Files with the same name and the same bytes on both sides are skipped without being
+    parsed; records whose canonical JSON matches (only formatting changed) are skipped too.
+
+    Changes are dicts: {'change': added|removed|modified, 'category', 'key', 'name', ...}
+    with the whole 'record' for additions, and a JSON Patch for modifications.
+    '''
+    new_version = new_version or old_version
+    old_folders = _folders(old_root, old_version, homebrew)
+    new_folders = _folders(new_root, new_version, homebrew)
+    for category in dict.fromkeys(list(old_folders)+list(new_folders)):
+        old = _files(old_folders[category]) if category in old_folders else {}
+        new = _files(new_folders[category]) if category in new_folders else {}
+        # Same file, same content hash: nothing to parse
+        same = {name for name in old.keys() & new.keys() if _digest(old[name]) == _digest(new[name])}
+        old_entries = [json.loads(data) for name, data in old.items() if name not in same]
+        new_entries = [json.loads(data) for name, data in new.items() if name not in same]
+
+        counts = Counter(key_of(category, e) for e in old_entries) | Counter(key_of(category, e) for e in new_entries)
+        shared = {key for key, n in counts.items() if n > 1}
+        before, after = _keyed(category, old_entries, shared), _keyed(category, new_entries, shared)
+
+        for key in sorted(before.keys() | after.keys(), key=str):
+            a, b = before.get(key), after.get(key)
+            change = {'category': category, 'key': key if not isinstance(key, tuple) else key[0]}
+            if a is None:
+                yield dict(change, change='added', name=b.get('Name'), hash=_digest(_canonical(b)), record=b)
+            elif b is None:
+                yield dict(change, change='removed', name=a.get('Name'))
+            else:
+                canonical = _canonical(b)
+                if _canonical(a) == canonical: continue
+                yield dict(change, change='modified', name=b.get('Name'), hash=_digest(canonical), patch=patch(a, b))
+
+def write_feed(changes, out, **header):
+    '''
+    Writes changes as NDJSON: a header line ({"feed": FEED_VERSION, ...header, "added",
+    "removed", "modified"}), then one line per change. Returns the header.
+    '''
+    changes = list(changes)
+    header = dict({'feed': FEED_VERSION}, **header)
+    for kind in ('added', 'removed', 'modified'):
+        header[kind] = sum(1 for c in changes if c['change'] == kind)
+    out.write(json.dumps(header, ensure_ascii=False)+'\n')
+    for change in changes:
+        out.write(json.dumps({'change': change.pop('change'), **change}, ensure_ascii=False, separators=(',', ':'))+'\n')
+    return header
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Writes an NDJSON change feed of the records that differ between two dataset roots.')
+    parser.add_argument('old_root')
+    parser.add_argument('new_root', nargs='?', help='defaults to old_root, for comparing game versions')
+    parser.add_argument('--old-version', default='v3.0')
+    parser.add_argument('--new-version', help='defaults to --old-version')
+    parser.add_argument('--no-homebrew', dest='homebrew', action='store_false')
+    parser.add_argument('--output', help='write the feed here instead of to stdout')
+    args = parser.parse_args(argv)
+
+    new_root, new_version = args.new_root or args.old_root, args.new_version or args.old_version
+    changes = diff(args.old_root, new_root, args.old_version, new_version, args.homebrew)
+    header = {'from': f'{args.old_root}@{args.old_version}', 'to': f'{new_root}@{new_version}'}
+    if args.output:
+        with open(args.output+'.tmp', 'w', encoding='utf-8') as out:
+            header = write_feed(changes, out, **header)
+        replace(args.output+'.tmp', args.output)
+        print(f"{header['added']} added, {header['removed']} removed, {header['modified']} modified")
+    else:
+        write_feed(changes, sys.stdout, **header)
+
+if __name__ == '__main__':
+  main()
@@ -1,79 +1,257 @@
-from os.path import join, exists
-from os import makedirs
-from fire import Fire
-from glob import glob
-import json
+from os.path import join, basename
+from fnmatch import fnmatch
+from multiprocessing import Pool
+from catalog import Catalog, CATEGORIES
+from bundle import Bundle
+from instrument import Instruments
+import time
 
 VERBOSE = False
+IMAGESETS = ['BookSprites', 'HomeSprites', 'BoxSprites', 'ShuffleTokens', "ItemSprites"]
+
+# # Process pool workers. Each worker gets its own copy of the engine when the pool starts.
+
+_worker_engine = None
+
+def _init_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+
+def _run_entry(job):
+    '''
+    Runs one engine call in a worker. Output that has to come from one process (appends to
+    shared files, rows for one database) is handed back to the parent with the record and
+    replayed there, so it lands in order.
+    '''
+    method, entry, write = job
+    _worker_engine._deferred = []
+    start = time.perf_counter()
+    record = getattr(_worker_engine, method)(entry, write)
+    seconds = time.perf_counter()-start
+    deferred, _worker_engine._deferred = _worker_engine._deferred, None
+    return record, deferred, seconds
 
 class Driver(object):
     '''
     The driver is generic and knows how to "pull data" from the dataset. It will pass that 
     to a given engine which formats a data point for the target output using any class that 
     inherits from the base Engine.
+    
+    With workers > 1, records are spread over a process pool in chunks of chunksize and come
+    back in the same order a serial run would produce them.
+    
+    Every build records a manifest of its sources in the engine's output folder. With 
+    incremental on, only entries whose source changed, or that embed a record whose source 
+    changed (see Engine.dependencies), are sent to the engine. Engines should be created 
+    without wiping their output for this, e.g. SRD_Engine(..., clean=False).
+    
+    Given the path to a compiled bundle (see bundle.compile_bundle), records are read from it
+    rather than from root. Bundles have no per file history, so they can't drive incremental builds.
+    
+    A catalog already loaded elsewhere can be handed in instead of root, overlays and bundle,
+    so builds of several engines share one read of the dataset (see multibuild).
+    
+    Overlays are dataset folders under root (Homebrew, a table's own) whose records replace the
+    core ones with the same _id or are added to them, see catalog.Catalog.
+    
+    Stage and record timings, I/O counters and engine warnings are kept in self.instruments 
+    (see instrument.Instruments). Given a report path, they're written there as JSON when the 
+    build ends, and given a profile folder, each stage is run under cProfile and dumped there.
     '''
 
-    def __init__(self, engine, root='../../', game_version='v3.0'):
+    def __init__(self, engine, root='../../', game_version=None, workers=1, chunksize=16, incremental=False, bundle=None,
+                 report=None, profile=None, overlays=(), catalog=None):
         self.engine = engine
         self.engine.driver = self
         self.game_version = self.engine.game_version
+        if game_version and game_version != self.game_version:
+            raise Exception(f"ERROR: Asked for {game_version}, but the engine builds {self.game_version}!")
         self.root = root
         self.export = True
+        self.workers = workers
+        self.chunksize = chunksize
+        self.bundle = Bundle(bundle) if bundle else catalog.bundle if catalog else None
+        if self.bundle and self.bundle.game_version != self.game_version:
+            raise Exception(f"ERROR: Bundle {bundle} is {self.bundle.game_version}, not {self.game_version}!")
+        if incremental and (self.bundle or not self.engine.TRACKED):
+            raise Exception("ERROR: Incremental builds need the dataset folders, not a bundle, and a tracked engine!")
+        self.instruments = Instruments(profile=profile)
+        self.report = report
+        if catalog and catalog.game_version != self.game_version:
+            raise Exception(f"ERROR: The catalog holds {catalog.game_version}, not {self.game_version}!")
+        if catalog: catalog.instruments = self.instruments
+        self.catalog = catalog or Catalog(root, self.game_version, self.bundle, self.instruments, overlays)
+        self.incremental = incremental
+        self.manifest = None
+        if self.engine.TRACKED and not self.bundle:
+            self.manifest = self.engine.open_manifest()
+        self._changes = None
+        if not incremental:
+            if self.manifest: self.manifest.sources = {}
+        elif not self.manifest.valid:
+            # Nothing to build on, so start from scratch
+            self.engine.clean()
+        self.engine.packs.merge = incremental
+        if incremental and self.manifest.valid: self.catalog.manifest = self.manifest
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.close()
+        else:
+            self.engine.abort()
+            self._save_report(failed=f'{exc_type.__name__}: {exc}')
+    
+    def close(self):
+        '''Lets the engine finish its output, e.g. moving buffered packs into place.'''
+        with self.instruments.stage('close'):
+            self.engine.close()
+            if self.manifest: self.manifest.save()
+        self._save_report()
+    
+    def refresh(self, paths=None):
+        '''
+        Readies the driver for another incremental pass after paths (or anything) changed on
+        disk, e.g. in watch mode. The catalog rereads them and the manifest is compared again.
+        '''
+        self.catalog.invalidate(paths)
+        self._changes = None
+    
+    def _save_report(self, **extra):
+        if not self.report: return
+        self.instruments.save(self.report, engine=type(self.engine).__name__, game_version=self.game_version,
+                              workers=self.workers, incremental=self.incremental, **extra)
         
     def _toggle_writes(self):
         if self.export: self.export = False
         else: self.export = True
         
-    def _drive(self, data_path, file_match):
-        for src in glob(join(data_path, file_match)):
+    def _scan(self):
+        '''
+        Compares every source against the manifest, once per driver. Returns the changed
+        source files, and the names of changed records per category (new names and old ones).
+        '''
+        if self._changes is None:
+            dirty, names, current = set(), {c: set() for c in CATEGORIES}, set()
+            for category in CATEGORIES:
+                for src in self.catalog.paths(category):
+                    current.add(src)
+                    if not self.manifest.changed(src): continue
+                    dirty.add(src)
+                    names[category] |= self.manifest.names(src) | {self.catalog.read(src).get('Name')}
+            for src, old in self.manifest.sources.items():
+                if src not in current: names[old['category']] |= self.manifest.names(src)
+            self._changes = (dirty, names)
+        return self._changes
+    
+    def _drive(self, category, file_match):
+        if not self.incremental:
+            for src, entry in self.catalog.entries(category, file_match):
+                if VERBOSE: print(src)
+                if self.manifest:
+                    self.manifest.record(src, category, entry, self.engine.dependencies(category, entry))
+                yield entry
+            return
+        
+        dirty, changed = self._scan()
+        paths = self.catalog.paths(category, file_match)
+        for src in paths:
+            old = self.manifest.sources.get(src)
+            if src not in dirty and not any(name in changed[c] for c, name in old['deps']):
+                self.instruments.count('records_unchanged')
+                continue
             if VERBOSE: print(src)
-            entry = json.loads(open(src).read())
+            entry = self.catalog.read(src)
+            if old and old['name'] != entry.get('Name'):
+                self.engine.discard(category, old)
+            self.manifest.record(src, category, entry, self.engine.dependencies(category, entry))
             yield entry
+        
+        # Sources that were deleted (or overridden by an overlay) since the last build. A record
+        # that's still built under the same name from another source keeps its output.
+        paths = set(paths)
+        built = None
+        for src, old in list(self.manifest.sources.items()):
+            if old['category'] == category and src not in paths and fnmatch(basename(src), file_match):
+                if built is None: built = {self.manifest.sources[p]['name'] for p in paths if p in self.manifest.sources}
+                if old['name'] not in built: self.engine.discard(category, old)
+                self.manifest.forget(src)
+
+    def _iterate(self, category, method, file_match):
+        '''Yields engine output for each matching entry, one at a time.'''
+        with self.instruments.stage(category):
+            self.engine.prepare()
+            entries = self._drive(category, file_match)
+            if self.workers <= 1:
+                for entry in entries:
+                    name, start = entry.get('Name'), time.perf_counter()
+                    record = getattr(self.engine, method)(entry, self.export)
+                    self.instruments.record(category, name, time.perf_counter()-start)
+                    yield record
+                return
+            
+            # Load everything before the pool starts so workers inherit a warm catalog
+            self.catalog.load_all()
+            names = []
+            def jobs():
+                for entry in entries:
+                    names.append(entry.get('Name'))
+                    yield method, entry, self.export
+            with Pool(self.workers, _init_worker, (self.engine,)) as pool:
+                for i, (record, deferred, seconds) in enumerate(pool.imap(_run_entry, jobs(), self.chunksize)):
+                    for call, args in deferred:
+                        getattr(self.engine, call)(*args)
+                    self.instruments.record(category, names[i], seconds)
+                    yield record
+
+    # # The iter_ functions stream records, so nothing is held once it's written out.
+
+    def iter_pokedex(self, file_match="*.json"):
+        return self._iterate('Pokedex', 'pokedex_entry', file_match)
+        
+    def iter_moves(self, file_match="*.json"):
+        return self._iterate('Moves', 'movedex_entry', file_match)
+        
+    def iter_abilities(self, file_match="*.json"):
+        return self._iterate('Abilities', 'abilitydex_entry', file_match)
+        
+    def iter_items(self, file_match="*.json"):
+        return self._iterate('Items', 'itemdex_entry', file_match)
+    
+    def iter_natures(self, file_match="*.json"):
+        return self._iterate('Natures', 'naturedex_entry', file_match)
+
+    # # The generate_ functions collect every record into a list.
 
     def generate_pokedex(self, file_match="*.json"):
-        data_path = join(self.root, self.game_version, 'Pokedex')
-        records = []
-        for entry in self._drive(data_path, file_match):
-            record = self.engine.pokedex_entry(entry, self.export)
-            records.append(record)
-        return records
+        return list(self.iter_pokedex(file_match))
         
     def generate_moves(self, file_match="*.json"):
-        data_path = join(self.root, self.game_version, 'Moves')
-        records = []
-        for entry in self._drive(data_path, file_match):
-            record = self.engine.movedex_entry(entry, self.export)
-            records.append(record)
-        return records
+        return list(self.iter_moves(file_match))
         
     def generate_abilities(self, file_match="*.json"):
-        data_path = join(self.root, self.game_version, 'Abilities')
-        records = []
-        for entry in self._drive(data_path, file_match):
-            record = self.engine.abilitydex_entry(entry, self.export)
-            records.append(record)
-        return records
+        return list(self.iter_abilities(file_match))
         
     def generate_items(self, file_match="*.json"):
-        data_path = join(self.root, self.game_version, 'Items')
-        records = []
-        for entry in self._drive(data_path, file_match):
-            record = self.engine.itemdex_entry(entry, self.export)
-            records.append(record)
-        return records
+        return list(self.iter_items(file_match))
     
     def generate_natures(self, file_match="*.json"):
-        data_path = join(self.root, self.game_version, 'Natures')
-        records = []
-        for entry in self._drive(data_path, file_match):
-            record = self.engine.naturedex_entry(entry, self.export)
-            records.append(record)
-        return records
+        return list(self.iter_natures(file_match))
     
     def generate_images(self, sets=[]):
         '''For each image set name you provide, call import_images. Setname is a param.'''
-        imagesets = ['BookSprites', 'HomeSprites', 'BoxSprites', 'ShuffleTokens', "ItemSprites"]
-        if 'ALL' in sets: sets = imagesets
+        if 'ALL' in sets: sets = IMAGESETS
         for s in sets:
-            if s in imagesets:
-                self.engine.import_images(join(self.root, 'images', s), s)
+            if s in IMAGESETS:
+                with self.instruments.stage(f'images/{s}'):
+                    self.engine.import_images(join(self.root, 'images', s), s)
+    
+    def generate_atlases(self, sets=['BoxSprites', 'ShuffleTokens'], webp=False):
+        '''For each image set name you provide, call import_atlas to pack it into sprite sheets.'''
+        if 'ALL' in sets: sets = IMAGESETS
+        atlases = {}
+        for s in [s for s in sets if s in IMAGESETS]:
+            with self.instruments.stage(f'atlases/{s}'):
+                atlases[s] = self.engine.import_atlas(join(self.root, 'images', s), s, webp)
+        return atlases
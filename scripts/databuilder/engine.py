@@ -1,14 +1,178 @@
 from os.path import join, exists, isdir, dirname
-from os import makedirs, listdir
-from fire import Fire
-from shutil import copy, rmtree
+from os import makedirs, listdir, replace, remove, fsync, stat, link, scandir
+from shutil import copy2, copystat, copyfileobj, rmtree
+from concurrent.futures import ThreadPoolExecutor
+from manifest import Manifest, file_digest
+import json
+import re
+
+FICLONE = 0x40049409 # Linux ioctl for a copy on write clone (btrfs, xfs)
+
+def _reflink(src, dst):
+    '''Clones src into dst where the filesystem supports it. Returns False if it can't.'''
+    try:
+        from fcntl import ioctl
+    except ImportError:
+        return False
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            return False
+    copystat(src, dst)
+    return True
+
+def sync_file(src, dst, hardlink=False, src_stat=None):
+    '''
+    Brings dst up to date with src. Files with the same size and mtime are left alone, and so
+    are same sized files with the same content hash. Otherwise dst becomes a hardlink (when
+    asked for), a reflink, or a plain copy, in that order of preference. Returns True if
+    anything was written. src_stat saves a stat when the caller already has one.
+    '''
+    try:
+        d = stat(dst)
+    except FileNotFoundError:
+        d = None
+    if d is not None:
+        s = src_stat or stat(src)
+        if d.st_size == s.st_size:
+            if d.st_mtime_ns == s.st_mtime_ns: return False
+            if file_digest(src) == file_digest(dst):
+                copystat(src, dst)
+                return False
+        remove(dst)
+    if hardlink:
+        try:
+            link(src, dst)
+            return True
+        except OSError:
+            pass
+    if not _reflink(src, dst):
+        copy2(src, dst)
+    return True
+
+# Image set folder: {file name: stat} of its images, listed ahead of time by preload_images
+_IMAGE_LISTINGS = {}
+
+def preload_images(sources):
+    '''
+    Lists image set folders once, so builds forked from this process (see multibuild) sync
+    them without each listing and stating every image again.
+    '''
+    for source in sources:
+        if isdir(source): _IMAGE_LISTINGS[source] = {f.name: f.stat() for f in scandir(source) if '.png' in f.name}
+
+def _image_listing(source):
+    return _IMAGE_LISTINGS.get(source) or {name: None for name in listdir(source) if '.png' in name}
+
+# Engines write _id and name first, so a pack line's key can be read without parsing all of it
+PACK_KEY = re.compile(r'\{"_id": ("(?:[^"\\]|\\.)*"), "name": ("(?:[^"\\]|\\.)*")')
+
+def pack_key(line):
+    '''Records in a pack are told apart by _id and name, since a few moves share an _id.'''
+    match = PACK_KEY.match(line)
+    if match: return (json.loads(match.group(1)), json.loads(match.group(2)))
+    doc = json.loads(line)
+    return (doc.get('_id'), doc.get('name'))
+
+class PackWriter(object):
+    '''
+    Keeps one buffered handle per line oriented pack file (NDJSON .db files and the like). 
+    Lines are written in batches to a temp file beside the pack, and close() renames each temp 
+    file over its pack, so a build that dies partway through never leaves a half written pack.
+    A pack that already exists when first opened is carried over, so writes still append.
+    
+    With merge on, existing records are loaded and kept by pack_key instead: writing a record 
+    replaces the old line in place, and discard drops one. Incremental builds use this to 
+    patch a pack without regenerating all of it.
+    '''
+    
+    def __init__(self, batch_size=256, merge=False):
+        self.batch_size = batch_size
+        self.merge = merge
+        self._handles = {}
+        self._buffers = {}
+        self._records = {}
+    
+    def __getstate__(self):
+        # Open handles stay with the process that opened them
+        return {'batch_size': self.batch_size, 'merge': self.merge, 
+                '_handles': {}, '_buffers': {}, '_records': {}}
+    
+    def _open(self, path):
+        makedirs(dirname(path) or '.', exist_ok=True)
+        handle = open(path+'.tmp', 'w', encoding='utf-8')
+        if self.merge:
+            records = self._records[path] = {}
+            if exists(path):
+                for line in open(path, encoding='utf-8'):
+                    records[pack_key(line)] = line
+        elif exists(path):
+            with open(path, encoding='utf-8') as existing:
+                copyfileobj(existing, handle)
+        self._handles[path] = handle
+        self._buffers[path] = []
+        
+    def write(self, path, line):
+        if path not in self._handles: self._open(path)
+        if self.merge:
+            self._records[path][pack_key(line)] = line
+            return
+        buffer = self._buffers[path]
+        buffer.append(line)
+        if len(buffer) >= self.batch_size: self.flush(path)
+    
+    def discard(self, path, key):
+        '''Drops a record from a merged pack.'''
+        if path not in self._handles: self._open(path)
+        self._records[path].pop(key, None)
+    
+    def flush(self, path):
+        self._handles[path].writelines(self._buffers[path])
+        self._buffers[path] = []
+    
+    def close(self):
+        '''Flushes every pack and moves it into place.'''
+        for path, handle in self._handles.items():
+            if self.merge: handle.writelines(self._records[path].values())
+            self.flush(path)
+            handle.flush()
+            fsync(handle.fileno())
+            handle.close()
+            replace(path+'.tmp', path)
+        self._handles, self._buffers, self._records = {}, {}, {}
+    
+    def abort(self):
+        '''Drops everything written since the packs were opened, leaving the old packs as they were.'''
+        for path, handle in self._handles.items():
+            handle.close()
+            remove(path+'.tmp')
+        self._handles, self._buffers, self._records = {}, {}, {}
 
 class Engine(object):
     
+    # Bump when an engine's output changes, so incremental builds know to start over.
+    VERSION = 1
+    # Whether the driver keeps a build manifest in output_path for this engine.
+    TRACKED = True
+    # Folders in output_path that image sets are synced into. clean() leaves them be, since
+    # _copy_imageset skips sprites that are up to date and removes the ones whose source is gone.
+    IMAGE_FOLDERS = ()
+    
     def __init__(self, output_path, game_version):
         self.output_path = output_path
         self.game_version = game_version
         self.driver = None
+        # Set by the driver's worker processes to collect (method, args) calls for the parent to 
+        # replay, for output that has to come from one process, like appends to a shared pack
+        self._deferred = None
+        self.packs = PackWriter()
+        # Hardlink sprites into the output instead of copying them. Only safe if nobody edits the output in place.
+        self.hardlink_images = False
+    
+    def prepare(self):
+        '''Called before each driver pass (and before any worker processes start), for engines that index the dataset up front.'''
+        pass
     
     # # These functions take JSON and return a string to be outputted. 
     
@@ -24,12 +188,77 @@ class Engine(object):
         pass
     def import_images(self, source, setname):
         pass
+    def import_atlas(self, source, setname, webp=False):
+        '''Packs an image set into sprite sheets plus an offset map. Needs Pillow.'''
+        from atlas import build_atlas
+        return build_atlas(source, self._pathgen(join(self.output_path, 'atlases')), setname, webp)
+    
+    # # Incremental builds
+    
+    def build_key(self):
+        '''Identifies the engine and settings a build was made with. Output made under another key is rebuilt.'''
+        return f'{type(self).__name__}/{self.VERSION}/{self.game_version}'
+    def open_manifest(self):
+        '''The manifest of the last build in output_path. Engines sharing a folder need their own file.'''
+        return Manifest(self.output_path, self.build_key())
+    def dependencies(self, category, entry):
+        '''(category, name) pairs for records from other categories that this entry's output embeds.'''
+        return []
+    def discard(self, category, record):
+        '''Removes the output for a record whose source is gone. record is its manifest entry.'''
+        pass
+    def clean(self):
+        if not self.IMAGE_FOLDERS or not isdir(self.output_path):
+            rmtree(self.output_path, ignore_errors=True)
+            return
+        for f in scandir(self.output_path):
+            if f.name in self.IMAGE_FOLDERS: continue
+            if f.is_dir(follow_symlinks=False): rmtree(f.path, ignore_errors=True)
+            else: remove(f.path)
+    
+    # # Called by the driver when it's done, or when a build fails.
+    
+    def close(self):
+        '''Called once the driver is done. Puts any appended packs in place.'''
+        self.packs.close()
+    def abort(self):
+        self.packs.abort()
 
     # # Utility
     
+    def warn(self, message):
+        '''A problem with one record that doesn't stop the build. Printed, and kept for the build report.'''
+        if self._deferred is not None:
+            self._deferred.append(('warn', (message,)))
+            return
+        print(message)
+        if self.driver: self.driver.instruments.warn(message)
+    
+    def _count(self, key, n=1):
+        '''Adds to one of the build report's counters.'''
+        if self._deferred is not None:
+            self._deferred.append(('_count', (key, n)))
+            return
+        if self.driver: self.driver.instruments.count(key, n)
+    
     def _write_to(self, data, path, mode='w'):
-        self._pathgen(dirname(path))
-        open(path,mode).write(data)
+        if self._deferred is not None and mode == 'a':
+            self._deferred.append(('_write_to', (data, path, mode)))
+            return
+        if mode == 'a':
+            self.packs.write(path, data)
+            self._count('pack_lines')
+        else:
+            # Incremental builds leave pages that came out the same alone, so vault
+            # indexers and file watchers downstream don't see a change
+            if self.driver and self.driver.incremental and exists(path) \
+                    and open(path).read() == data:
+                self._count('files_unchanged')
+                return
+            self._pathgen(dirname(path))
+            open(path,mode).write(data)
+            self._count('files_written')
+        self._count('bytes_written', len(data.encode('utf-8')))
     
     def _pathgen(self, path, validate=False):
         '''
@@ -42,9 +271,21 @@ class Engine(object):
             makedirs(path, exist_ok=True)
         return path
     
-    def _copy_imageset(self, source, output, prefix='', postfix=''):
-        for img in [x for x in listdir(source) if '.png' in x]:
+    def _copy_imageset(self, source, output, prefix='', postfix='', workers=8, hardlink=None):
+        '''
+        Syncs an image set into output on a thread pool, skipping images that are already up to
+        date and removing ones whose source is gone. Returns how many images were written.
+        '''
+        if hardlink is None: hardlink = self.hardlink_images
+        pairs = {}
+        for img, st in _image_listing(source).items():
             sname = img.split('.')
             srdname = f'{prefix}{sname[0]}{postfix}.{sname[1]}'
-            copy(join(source, img), join(output, srdname))
-            # print(join(source, img), join(output, srdname))
\ No newline at end of file
+            pairs[srdname] = (join(source, img), st)
+        for stale in [x for x in listdir(output) if '.png' in x and x not in pairs]:
+            remove(join(output, stale))
+        with ThreadPoolExecutor(workers) as pool:
+            written = sum(pool.map(lambda name: sync_file(pairs[name][0], join(output, name), hardlink, pairs[name][1]), pairs))
+        self._count('images_written', written)
+        self._count('images_unchanged', len(pairs)-written)
+        return written
\ No newline at end of file
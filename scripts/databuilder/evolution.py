@@ -0,0 +1,214 @@
+from os.path import basename, splitext
+import json
+import re
+
+# Evolutions of these kinds change form rather than evolve, so they don't add a stage
+FORM_KINDS = ['Mega', 'Form']
+DEXID = re.compile(r'(\d{4})(.*)')
+# DexID suffixes and the kind of variant they mark
+VARIANTS = [(re.compile(r'[XY]|M\d?'), 'mega'), (re.compile(r'[GAHP]\w?'), 'regional')]
+
+def variant(dexid):
+    '''mega, regional or form for a variant DexID, None for a base species.'''
+    match = DEXID.fullmatch(dexid or '')
+    if not match or not match.group(2): return None
+    for pattern, kind in VARIANTS:
+        if pattern.fullmatch(match.group(2)): return kind
+    return 'form'
+
+class EvolutionGraph(object):
+    '''
+    Every evolution in the Pokedex as one graph, keyed by DexID. Pokemon list the ones they
+    evolve To and From, so most edges are stated on both ends. Both ends are merged here, and
+    edges missing one end (or disagreeing on Kind) are listed in self.inconsistencies.
+
+    Everything is worked out when the graph is built, so lookups are dict reads:
+    - family_of: every DexID linked by evolution, or by being a form of the same Number
+    - stage_of: 1 for a base Pokemon, plus one per evolution. Mega and Form changes keep the stage.
+    - evolves_to, evolves_from: direct (DexID, Kind) edges
+    - all_descendants: every DexID reachable by evolving, Megas and forms included
+    - forms_of: the other DexIDs with the same Number (Megas, regional forms, other forms)
+
+    Lookups take a DexID, a Name, or a file name (see catalog.Catalog). Results are DexIDs.
+    '''
+
+    def __init__(self, entries):
+        '''entries: (source path, Pokedex entry) pairs, e.g. from Catalog.entries('Pokedex').'''
+        entries = list(entries)
+        self.inconsistencies = []
+        self.dexids = [entry.get('DexID') for _, entry in entries]
+        self.names = [entry.get('Name') for _, entry in entries]
+        self._index = {}
+        for i, (src, entry) in enumerate(entries):
+            if self.dexids[i] in self._index:
+                first = self.names[self._index[self.dexids[i]]]
+                self.inconsistencies.append(f'DexID {self.dexids[i]} is shared by {first} and {self.names[i]}')
+            self._index.setdefault(self.dexids[i], i)
+        # Files are named after their entry, but the filename wins when they disagree (Type: Null)
+        names = {}
+        for i, name in enumerate(self.names): names.setdefault(name, i)
+        names.update((splitext(basename(src))[0], i) for i, (src, _) in enumerate(entries))
+        for name, i in names.items(): self._index.setdefault(name, i)
+
+        self.edges = self._merge(entries)
+        n = len(entries)
+        self._to = [[] for _ in range(n)]
+        self._from = [[] for _ in range(n)]
+        for (parent, child), kind in self.edges.items():
+            self._to[parent].append((child, kind))
+            self._from[child].append((parent, kind))
+        self._stages = self._stage_all()
+        self._descendants = [self._reach(i) for i in range(n)]
+        self._forms, self._families = self._group(entries)
+
+    def _merge(self, entries):
+        '''(parent, child): Kind for every evolution, checking that both ends state it.'''
+        stated = {'To': {}, 'From': {}}
+        for i, (src, entry) in enumerate(entries):
+            for evolution in entry.get('Evolutions') or []:
+                for direction in ('To', 'From'):
+                    if direction not in evolution: continue
+                    other = self._index.get(evolution[direction])
+                    if other is None:
+                        self.inconsistencies.append(f'{self.names[i]} evolves {direction.lower()} {evolution[direction]}, which is not in the Pokedex')
+                    elif other == i:
+                        self.inconsistencies.append(f'{self.names[i]} evolves {direction.lower()} itself')
+                    else:
+                        edge = (i, other) if direction == 'To' else (other, i)
+                        stated[direction][edge] = evolution.get('Kind')
+        edges = dict(stated['From'])
+        edges.update(stated['To'])
+        for (parent, child), kind in edges.items():
+            if (parent, child) not in stated['From']:
+                self.inconsistencies.append(f'{self.names[parent]} evolves to {self.names[child]}, but {self.names[child]} has no From {self.names[parent]}')
+            elif (parent, child) not in stated['To']:
+                self.inconsistencies.append(f'{self.names[child]} evolves from {self.names[parent]}, but {self.names[parent]} has no To {self.names[child]}')
+            elif stated['From'][(parent, child)] != kind:
+                self.inconsistencies.append(f"{self.names[parent]} to {self.names[child]} is a {kind} evolution on one end and {stated['From'][(parent, child)]} on the other")
+        return edges
+
+    def _stage_all(self):
+        stages = [None]*len(self.dexids)
+        def stage(i, seen):
+            if stages[i] is None:
+                # Forms that change into each other (Ogerpon's masks) would loop, so a parent
+                # already on the path counts as a base
+                parents = [(p, kind) for p, kind in self._from[i] if p not in seen]
+                stages[i] = max((stage(p, seen | {i}) + (kind not in FORM_KINDS) for p, kind in parents), default=1)
+            return stages[i]
+        for i in range(len(stages)): stage(i, frozenset())
+        return stages
+
+    def _reach(self, i):
+        seen, stack = {i}, [i]
+        while stack:
+            for child, _ in self._to[stack.pop()]:
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        seen.discard(i)
+        return tuple(sorted(self.dexids[c] for c in seen))
+
+    def _group(self, entries):
+        '''Forms per Number, and families: connected groups over evolutions and shared Numbers.'''
+        numbers = {}
+        for i, (_, entry) in enumerate(entries):
+            numbers.setdefault(entry.get('Number'), []).append(i)
+        forms = [tuple(self.dexids[o] for o in numbers[entry.get('Number')] if o != i) for i, (_, entry) in enumerate(entries)]
+
+        family = list(range(len(entries)))
+        def root(i):
+            while family[i] != i:
+                family[i] = family[family[i]]
+                i = family[i]
+            return i
+        links = list(self.edges) + [(group[0], o) for group in numbers.values() for o in group[1:]]
+        for a, b in links:
+            family[root(a)] = root(b)
+        members = {}
+        for i in range(len(entries)):
+            members.setdefault(root(i), []).append(self.dexids[i])
+        families = [tuple(sorted(members[root(i)])) for i in range(len(entries))]
+        return forms, families
+
+    # # Lookups
+
+    def _node(self, key):
+        if key not in self._index: raise KeyError(f'{key} is not in the Pokedex')
+        return self._index[key]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def dexid_of(self, key):
+        return self.dexids[self._node(key)]
+
+    def name_of(self, key):
+        return self.names[self._node(key)]
+
+    def family_of(self, key):
+        return self._families[self._node(key)]
+
+    def stage_of(self, key):
+        return self._stages[self._node(key)]
+
+    def evolves_to(self, key):
+        return [(self.dexids[c], kind) for c, kind in self._to[self._node(key)]]
+
+    def evolves_from(self, key):
+        return [(self.dexids[p], kind) for p, kind in self._from[self._node(key)]]
+
+    def all_descendants(self, key):
+        return self._descendants[self._node(key)]
+
+    def forms_of(self, key):
+        return self._forms[self._node(key)]
+
+    def families(self):
+        '''Every family once, largest first.'''
+        return sorted(set(self._families), key=lambda f: (-len(f), f))
+
+    # # Export
+
+    def adjacency(self):
+        '''
+        The graph as plain lists, for engines and other apps: nodes are [DexID, Name, stage,
+        variant], edges are [parent, child, Kind] by node index, families are lists of node indexes.
+        '''
+        position = {self._families[i]: None for i in range(len(self.dexids))}
+        families = []
+        for i, family in enumerate(self._families):
+            if position[family] is None:
+                position[family] = len(families)
+                families.append([])
+            families[position[family]].append(i)
+        return {
+            'nodes': [[dexid, name, stage, variant(dexid)]
+                      for dexid, name, stage in zip(self.dexids, self.names, self._stages)],
+            'edges': [[parent, child, kind] for (parent, child), kind in sorted(self.edges.items())],
+            'families': families,
+        }
+
+    def save(self, path):
+        open(path, 'w', encoding='utf-8').write(json.dumps(self.adjacency(), ensure_ascii=False, separators=(',', ':')))
+
+def build(root='../../', game_version='v3.0'):
+    from catalog import Catalog
+    return Catalog(root, game_version).evolutions()
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Builds a game version's evolution graph and lists evolutions that don't add up.")
+    parser.add_argument('game_version', nargs='?', default='v3.0')
+    parser.add_argument('--root', default='../../')
+    parser.add_argument('--output', help='write the adjacency lists here as JSON')
+    args = parser.parse_args(argv)
+
+    graph = build(args.root, args.game_version)
+    for problem in graph.inconsistencies: print(problem)
+    print(f'{len(graph.dexids)} Pokemon, {len(graph.edges)} evolutions, {len(graph.families())} families, '
+          f'{len(graph.inconsistencies)} inconsistencies')
+    if args.output: graph.save(args.output)
+
+if __name__ == '__main__':
+  main()
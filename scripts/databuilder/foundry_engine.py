@@ -1,21 +1,75 @@
 from engine import Engine
-from os.path import join, exists
-from shutil import rmtree
+from os.path import join, exists, getmtime
+from os import remove
 from datetime import datetime
 from hashlib import blake2b
 import json
 
 DEFAULT_POKEMON_MANEUVERS = ['Struggle - Physical', 'Struggle - Special', 'Grapple', 'Help Another', 'Cover An Ally', 'Run Away', 'Ambush', 'Clash', 'Evasion', 'Stabilize An Ally']
 POKEMON_TOKEN_IMAGES = 'book'
+PACKS = {'Pokedex': 'pokedex.db', 'Moves': 'moves.db', 'Abilities': 'abilities.db', 'Items': 'items.db'}
 
 class Foundry_Engine(Engine):
+    '''
+    With shared_items on, Pokemon don't embed whole copies of their moves and abilities. Each
+    item is a reference instead, {"_id", "name", "pack": "moves", "system": {"rank": ...}},
+    and reads as the document with that _id and name in moves.db (or abilities.db) with the
+    rest of the reference merged over it, see packs.expand. This makes pokedex.db many times
+    smaller, but whatever loads it has to expand the references.
     
-    def __init__(self, output_path, game_version, foundry_version):
+    With compress set to gzip or zstd, each pack gets a compressed copy beside it (pokedex.db.gz,
+    say). The plain packs are kept, since Foundry reads those.
+    '''
+    
+    IMAGE_FOLDERS = ('images',)
+    
+    def __init__(self, output_path, game_version, foundry_version, clean=True, shared_items=False, compress=None):
         super().__init__(output_path, game_version)
         self.foundry_version = foundry_version
         self.display_version = f"Core {game_version}"
+        self.shared_items = shared_items
+        self.compress = compress
         # Wipe out the Output folder you provided. 
-        rmtree(self.output_path, ignore_errors=True)
+        if clean: self.clean()
+    
+    # # Incremental builds
+    
+    def build_key(self):
+        return f'{super().build_key()}/{self.foundry_version}' + ('/shared' if self.shared_items else '')
+    
+    def dependencies(self, category, entry):
+        # Pokemon embed their moves, the default maneuvers and their abilities
+        if category != 'Pokedex': return []
+        moves = [('Moves', x['Name']) for x in entry['Moves']] + [('Moves', y) for y in DEFAULT_POKEMON_MANEUVERS]
+        return moves + [('Abilities', x) for x in [entry['Ability1'], entry['Ability2']] if x]
+    
+    def discard(self, category, record):
+        if category not in PACKS: return
+        _id = blake2b(bytes(record['_id'], 'utf-8'), digest_size=8).hexdigest()
+        self.packs.discard(join(self.output_path, 'packs', PACKS[category]), (_id, record['name']))
+    
+    def close(self):
+        super().close()
+        from packs import compress, SUFFIXES
+        for name in PACKS.values():
+            path = join(self.output_path, 'packs', name)
+            # Copies made with another method (or with compress since turned off) would be stale
+            for method, suffix in SUFFIXES.items():
+                if method != self.compress and exists(path+suffix): remove(path+suffix)
+            # Packs an incremental build didn't touch keep the copy they have
+            if not self.compress or not exists(path) or \
+                    (exists(path+SUFFIXES[self.compress]) and getmtime(path+SUFFIXES[self.compress]) >= getmtime(path)):
+                continue
+            self._count(f'{self.compress}_bytes', compress(path, self.compress))
+    
+    def _embedded(self, pack, entry, convert, overrides):
+        '''A move or ability as a Pokemon carries it: a whole document, or a reference with shared_items on.'''
+        if self.shared_items:
+            return {"_id": blake2b(bytes(entry['_id'], 'utf-8'), digest_size=8).hexdigest(), "name": entry['Name'],
+                    "pack": pack, **overrides}
+        item = convert(entry, False)
+        for key, value in overrides.items(): item[key].update(value)
+        return item
     
     # # These functions take JSON and return a string to be outputted. 
     
@@ -24,35 +78,31 @@ class Foundry_Engine(Engine):
         moves = []
         abilities = []
         
-        # Block where writes are disabled on the driver, to prevent adding
-        # duplicate entries to the move/ability dbs
-        self.driver._toggle_writes()
+        # Moves and abilities come from the driver's catalog, and are converted without
+        # writing so they don't add duplicate entries to the move/ability dbs
+        catalog = self.driver.catalog
         for x in learnset:
-            try:
-                move = self.driver.generate_moves(file_match=f'{x["Name"]}.json')[0]
-                move['system']['rank'] = x['Learned'].lower()
-                moves.append(move)
-            except IndexError as e:
-                print(f"Move {x['Name']} not found in Pokemon {entry['Name']}")
+            move = catalog.get('Moves', x['Name'])
+            if move is None:
+                self.warn(f"Move {x['Name']} not found in Pokemon {entry['Name']}")
+                continue
+            moves.append(self._embedded('moves', move, self.movedex_entry, {'system': {'rank': x['Learned'].lower()}}))
                 
         # For x in maneuvers
         for y in DEFAULT_POKEMON_MANEUVERS:
-            try:
-                move = self.driver.generate_moves(file_match=f'{y}.json')[0]
-                move['system']['rank'] = 'starter'
-                moves.append(move)
-            except IndexError as e:
-                print(f"Move {y} not found in Pokemon {entry['Name']}")
+            move = catalog.get('Moves', y)
+            if move is None:
+                self.warn(f"Move {y} not found in Pokemon {entry['Name']}")
+                continue
+            moves.append(self._embedded('moves', move, self.movedex_entry, {'system': {'rank': 'starter'}}))
         
         for x in [entry['Ability1'], entry['Ability2']]:
             if not x: continue
-            try:
-                ability = self.driver.generate_abilities(file_match=f'{x}.json')[0]
-                abilities.append(ability)
-            except IndexError as e:
-                print(f"Ability {x} not found in Pokemon {entry['Name']}")
-        
-        self.driver._toggle_writes()
+            ability = catalog.get('Abilities', x)
+            if ability is None:
+                self.warn(f"Ability {x} not found in Pokemon {entry['Name']}")
+                continue
+            abilities.append(self._embedded('abilities', ability, self.abilitydex_entry, {}))
     
         foundry_items = moves+abilities
         
@@ -0,0 +1,145 @@
+from catalog import Catalog, CATEGORIES
+from yaml.resolver import Resolver
+import time
+import yaml
+
+try: from yaml import CDumper as FastDumper
+except ImportError: FastDumper = yaml.Dumper
+
+WIDTH = 80 # PyYAML's default best_width, plain scalars fold at the first single space past it
+INDENT = '  '
+STR_TAG = 'tag:yaml.org,2002:str'
+NOT_FIRST = set('-?:,[]{}#&*!|>\'"%@` ')
+
+_resolver = Resolver()
+
+def _plain(text):
+    '''Whether PyYAML would write text as a plain scalar, checked conservatively.'''
+    return (text and text.isascii() and text.isprintable()
+            and text[0] not in NOT_FIRST and text[-1] != ' ' and text[-1] != ':'
+            and ': ' not in text and ' #' not in text and not text.startswith('...')
+            and _resolver.resolve(yaml.ScalarNode, text, (True, False)) == STR_TAG)
+
+def _scalar(value):
+    '''value as PyYAML writes it, or None if it takes more than a plain scalar.'''
+    if isinstance(value, str): return value if _plain(value) else None
+    if value is True: return 'true'
+    if value is False: return 'false'
+    if value is None: return 'null'
+    if isinstance(value, int): return str(value)
+    if isinstance(value, float) and value == value and value not in (float('inf'), float('-inf')):
+        text = repr(value).lower()
+        return text.replace('e', '.0e', 1) if '.' not in text and 'e' in text else text
+    return None
+
+def _fold(text, column):
+    '''A plain scalar starting at column, broken at single spaces past WIDTH like PyYAML's write_plain.'''
+    out, start, spaces = [], 0, False
+    for end in range(len(text)+1):
+        ch = text[end] if end < len(text) else None
+        if spaces:
+            if ch != ' ':
+                if start+1 == end and column > WIDTH:
+                    out.append('\n'+INDENT)
+                    column = len(INDENT)
+                else:
+                    out.append(text[start:end])
+                    column += end-start
+                start = end
+        elif ch is None or ch == ' ':
+            out.append(text[start:end])
+            column += end-start
+            start = end
+        spaces = ch == ' '
+    return ''.join(out)
+
+def _mapping(value, indent):
+    '''Lines of a flat mapping nested at indent, or None if any key or value isn't a short plain scalar.'''
+    lines = []
+    for key in sorted(value):
+        k, v = _scalar(key) if isinstance(key, str) else None, _scalar(value[key])
+        if k is None or v is None or len(indent)+len(k)+2+len(v) > WIDTH: return None
+        lines.append(f'{k}: {v}')
+    return lines
+
+def _value(key, value):
+    '''The "key: value" block for one top level key, or None to leave it to PyYAML.'''
+    if isinstance(value, (list, dict)) and not value:
+        return f'{key}: {"[]" if isinstance(value, list) else "{}"}\n'
+    if isinstance(value, list):
+        out = [f'{key}:\n']
+        for item in value:
+            if isinstance(item, dict):
+                lines = _mapping(item, INDENT) if item else ['{}']
+                if lines is None: return None
+                out.append('- ' + ('\n'+INDENT).join(lines) + '\n')
+            else:
+                text = _scalar(item)
+                if text is None or len(text)+2 > WIDTH: return None
+                out.append(f'- {text}\n')
+        return ''.join(out)
+    if isinstance(value, dict):
+        lines = _mapping(value, INDENT)
+        if lines is None: return None
+        return f'{key}:\n' + ''.join(f'{INDENT}{line}\n' for line in lines)
+    text = _scalar(value)
+    if text is None: return None
+    return f'{key}: {_fold(text, len(key)+2)}\n'
+
+def _yaml(key, value):
+    '''PyYAML for one key, through LibYAML when it writes the same bytes.'''
+    dumper = FastDumper if _libyaml_safe({key: value}) else yaml.Dumper
+    return yaml.dump({key: value}, Dumper=dumper)
+
+def _libyaml_safe(value):
+    '''
+    LibYAML folds double quoted strings (anything not printable ASCII) and lays out long
+    "? key" mapping keys (128+ characters once quoted) differently from PyYAML, everything
+    else comes out the same.
+    '''
+    if isinstance(value, str): return value.isascii() and value.isprintable()
+    if isinstance(value, dict):
+        return all(_libyaml_safe(k) and (not isinstance(k, str) or len(k) < 64) and _libyaml_safe(v)
+                   for k, v in value.items())
+    if isinstance(value, list): return all(_libyaml_safe(v) for v in value)
+    return True
+
+def dump(entry):
+    '''
+    Byte for byte what yaml.dump(entry) returns, for the flat and list valued records of the
+    dataset. Plain scalars, flat mappings and lists of them are written directly, anything else
+    goes to PyYAML one top level key at a time.
+    '''
+    out = []
+    for key in sorted(entry):
+        value = entry[key]
+        text = _value(key, value) if _plain(key) else None
+        out.append(text if text is not None else _yaml(key, value))
+    return ''.join(out)
+
+def _records(root, game_version):
+    catalog = Catalog(root, game_version)
+    for category in CATEGORIES:
+        for _, entry in catalog.entries(category):
+            yield entry.to_dict()
+
+def verify(root='../../', game_version='v3.0'):
+    '''Checks dump() against yaml.dump() for every record in game_version.'''
+    mismatches = [e.get('Name') for e in _records(root, game_version) if dump(e) != yaml.dump(e)]
+    if mismatches: raise Exception(f"ERROR: front matter differs from yaml.dump for {mismatches}")
+    print(f'{game_version}: front matter matches yaml.dump')
+
+def benchmark(root='../../', game_version='v3.0', repeat=3):
+    '''Best of repeat runs of yaml.dump() and dump() over every record in game_version.'''
+    entries = list(_records(root, game_version))
+    for name, fn in [('yaml.dump', yaml.dump), ('front_matter.dump', dump)]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for entry in entries: fn(entry)
+            best = min(best, time.perf_counter()-start)
+        print(f'{name:18} {best:.3f}s for {len(entries)} records')
+
+if __name__ == '__main__':
+  from fire import Fire
+  Fire()
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from collections import Counter
+from os.path import join
+from os import makedirs, replace
+import heapq
+import json
+import time
+
+class Instruments(object):
+    '''
+    What a build spent its time on. The driver times each stage (a category pass, an image
+    set, closing) and each record, and keeps the slowest ones. The catalog and engines add to
+    counters (files read and written, bytes, cache hits and misses) and collect warnings.
+
+    Given a profile folder, every stage also runs under cProfile and is dumped to
+    {profile}/{stage}.prof, for pstats or snakeviz.
+    '''
+
+    def __init__(self, slowest=20, profile=None):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = Counter()
+        self.warnings = []
+        self.slowest_n = slowest
+        self.profile = profile
+        self._slowest = []
+
+    @contextmanager
+    def stage(self, name):
+        '''Times everything run inside it as one stage. Stages of the same name add up.'''
+        profiler = None
+        if self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter()-start
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'records': 0})
+            stage['seconds'] += seconds
+            if profiler:
+                profiler.disable()
+                makedirs(self.profile, exist_ok=True)
+                profiler.dump_stats(join(self.profile, f"{name.replace('/', '-')}.prof"))
+
+    def record(self, stage, name, seconds):
+        '''One record of stage took seconds.'''
+        self.stages.setdefault(stage, {'seconds': 0.0, 'records': 0})['records'] += 1
+        item = (seconds, stage, name or '')
+        if len(self._slowest) < self.slowest_n: heapq.heappush(self._slowest, item)
+        elif item > self._slowest[0]: heapq.heapreplace(self._slowest, item)
+
+    def count(self, key, n=1):
+        self.counters[key] += n
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+    def report(self, **extra):
+        '''Everything recorded so far, as a JSON ready dict.'''
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage, seconds=round(stage['seconds'], 6))
+            if stage['records'] and stage['seconds']:
+                stages[name]['records_per_second'] = round(stage['records']/stage['seconds'], 1)
+        return dict(extra,
+            seconds=round(time.perf_counter()-self.started, 6),
+            stages=stages,
+            counters=dict(sorted(self.counters.items())),
+            slowest=[{'stage': stage, 'name': name, 'seconds': round(seconds, 6)}
+                     for seconds, stage, name in sorted(self._slowest, reverse=True)],
+            warnings=self.warnings)
+
+    def save(self, path, **extra):
+        open(path+'.tmp', 'w').write(json.dumps(self.report(**extra), indent=4, ensure_ascii=False))
+        replace(path+'.tmp', path)
@@ -0,0 +1,66 @@
+from os.path import join, exists, basename, splitext, dirname
+from os import stat, makedirs, replace
+from hashlib import blake2b
+import json
+
+MANIFEST_FILE = '.build-manifest.json'
+
+def file_digest(path):
+    return blake2b(open(path, 'rb').read(), digest_size=16).hexdigest()
+
+class Manifest(object):
+    '''
+    Records what an engine's output was built from: each source file's size, mtime and content
+    hash, the record it produced, and the records from other categories it embeds. The next
+    incremental build compares against it to find what needs regenerating.
+
+    A manifest is only trusted if it was written by the same engine, engine version and build
+    settings, see Engine.build_key.
+    '''
+
+    def __init__(self, output_path, build_key, name=MANIFEST_FILE):
+        self.path = join(output_path, name)
+        self.build_key = build_key
+        self.sources = {}
+        self.valid = False
+        if exists(self.path):
+            data = json.loads(open(self.path).read())
+            if data.get('build_key') == build_key:
+                self.sources = data['sources']
+                self.valid = True
+
+    def changed(self, src):
+        '''
+        True if src differs from the last build. Size and mtime are checked first, the file
+        is only hashed when those moved.
+        '''
+        old = self.sources.get(src)
+        if old is None: return True
+        st = stat(src)
+        if [st.st_size, st.st_mtime_ns] == old['stat']: return False
+        return file_digest(src) != old['hash']
+
+    def record(self, src, category, entry, deps=()):
+        st = stat(src)
+        self.sources[src] = {
+            'category': category,
+            'stat': [st.st_size, st.st_mtime_ns],
+            'hash': file_digest(src),
+            'name': entry.get('Name'),
+            '_id': entry.get('_id'),
+            'deps': [list(d) for d in deps],
+        }
+
+    def names(self, src):
+        '''The names a source's record can be looked up by: its filename and its Name.'''
+        old = self.sources.get(src, {})
+        return {splitext(basename(src))[0], old.get('name')} - {None}
+
+    def forget(self, src):
+        return self.sources.pop(src, None)
+
+    def save(self):
+        makedirs(dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path+'.tmp'
+        open(tmp, 'w').write(json.dumps({'build_key': self.build_key, 'sources': self.sources}))
+        replace(tmp, self.path)
@@ -0,0 +1,72 @@
+from catalog import Catalog
+from driver import Driver, IMAGESETS
+from engine import preload_images
+from collections import deque
+from multiprocessing import get_context
+from os.path import join, normpath
+from os import cpu_count
+import json
+import time
+
+# Filled in by build_all before the pool forks, so every build reads the parent's copy
+_jobs = {}
+
+def _build(key):
+    '''Runs one (game_version, engine name) build on its preloaded catalog. Returns its report.'''
+    engine, catalog, stages, images, root, incremental = _jobs[key]
+    with Driver(engine, root=root, incremental=incremental and engine.TRACKED, catalog=catalog) as driver:
+        for stage in stages:
+            deque(getattr(driver, f'iter_{stage}')(), maxlen=0)
+        driver.generate_images(images)
+    return key, driver.instruments.report(engine=type(engine).__name__, game_version=engine.game_version)
+
+def build_all(jobs, root='../../', workers=None, incremental=False, overlays=(), report=None):
+    '''
+    Runs several builds at once, one process each, up to workers (every core by default) at a
+    time. jobs are (game_version, name, engine, stages, image sets), one per version and engine.
+
+    Each game version's dataset is read once, and image set folders are listed once, in this
+    process. The builds are forked from it and share both, so a run costs about as much as the
+    slowest build on its own, given enough cores. Where processes can't be forked, the builds
+    run one after another on the same shared catalogs.
+
+    Builds that would write to the same place are refused. Returns {version/name: report},
+    which is also written to report as JSON when given.
+    '''
+    outputs = {}
+    for version, name, engine, _, _ in jobs:
+        where = normpath(engine.open_manifest().path if engine.TRACKED else engine.output_path)
+        if where in outputs:
+            raise Exception(f"ERROR: {name} {version} and {outputs[where]} would both write to {where}!")
+        outputs[where] = f'{name} {version}'
+
+    start = time.perf_counter()
+    catalogs = {version: Catalog(root, version, overlays=overlays).load_all() for version in dict.fromkeys(j[0] for j in jobs)}
+    preload_images([join(root, 'images', s) for s in IMAGESETS if any(s in j[4] for j in jobs)])
+    _jobs.clear()
+    for version, name, engine, stages, images in jobs:
+        _jobs[f'{version}/{name}'] = (engine, catalogs[version], stages, images, root, incremental)
+    loaded = time.perf_counter()-start
+
+    try:
+        context = get_context('fork')
+    except ValueError:
+        context = None
+    results = {}
+    if context and len(_jobs) > 1:
+        with context.Pool(min(workers or cpu_count() or 1, len(_jobs))) as pool:
+            for key, result in pool.imap_unordered(_build, list(_jobs)):
+                print(f"{key}: {result['seconds']:.2f}s", flush=True)
+                results[key] = result
+    else:
+        for key in list(_jobs):
+            results[key] = _build(key)[1]
+            print(f"{key}: {results[key]['seconds']:.2f}s", flush=True)
+    _jobs.clear()
+
+    wall = time.perf_counter()-start
+    print(f'{len(results)} builds in {wall:.2f}s ({loaded:.2f}s loading the dataset)', flush=True)
+    if report:
+        open(report, 'w', encoding='utf-8').write(json.dumps(
+            {'seconds': round(wall, 4), 'loading': round(loaded, 4), 'builds': results}, indent=2, ensure_ascii=False))
+    return results
@@ -0,0 +1,149 @@
+from engine import pack_key
+from os.path import join, exists, getsize
+from os import replace, listdir
+from copy import deepcopy
+import gzip
+import json
+import time
+
+# Compressed copies of a pack sit beside it, with these suffixes
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 10
+
+def _zstd():
+    '''The zstd module: compression.zstd on Python 3.14+, the zstandard package before that.'''
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise Exception("ERROR: zstd packs need Python 3.14+ or the zstandard package!") from None
+
+def _compress(data, method):
+    if method == 'gzip': return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    zstd = _zstd()
+    if zstd.__name__ == 'zstandard': return zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zstd.compress(data, ZSTD_LEVEL)
+
+def _decompress(data, method):
+    if method == 'gzip': return gzip.decompress(data)
+    zstd = _zstd()
+    if zstd.__name__ == 'zstandard': return zstd.ZstdDecompressor().decompress(data)
+    return zstd.decompress(data)
+
+def compress(path, method):
+    '''Writes path's compressed copy beside it (pokedex.db.gz, say). Returns its size in bytes.'''
+    if method not in SUFFIXES: raise Exception(f"ERROR: Packs can be compressed with {', '.join(SUFFIXES)}, not {method}!")
+    target = path+SUFFIXES[method]
+    data = _compress(open(path, 'rb').read(), method)
+    open(target+'.tmp', 'wb').write(data)
+    replace(target+'.tmp', target)
+    return len(data)
+
+def read(path):
+    '''The lines of a pack, from the pack itself or from a .gz or .zst copy of it.'''
+    data = open(path, 'rb').read()
+    for method, suffix in SUFFIXES.items():
+        if path.endswith(suffix): data = _decompress(data, method)
+    return data.decode('utf-8').splitlines(keepends=True)
+
+# # Shared items (see Foundry_Engine.shared_items)
+
+def overlay(base, overrides):
+    '''base with overrides merged into it, objects key by key. base isn't changed.'''
+    merged = dict(base)
+    for key, value in overrides.items():
+        merged[key] = overlay(base[key], value) if isinstance(value, dict) and isinstance(base.get(key), dict) else value
+    return merged
+
+def expand(doc, bases):
+    '''
+    doc with every shared item replaced by the whole document it refers to. Shared items are
+    {"_id", "name", "pack", ...overrides}, and bases are {pack name: {(_id, name): document}}.
+    '''
+    items = []
+    for item in doc.get('items', []):
+        if 'pack' not in item:
+            items.append(item)
+            continue
+        base = bases[item['pack']].get((item['_id'], item['name']))
+        if base is None: raise Exception(f"ERROR: {doc['name']} refers to {item['name']}, which isn't in {item['pack']}!")
+        items.append(overlay(deepcopy(base), {k: v for k, v in item.items() if k != 'pack'}))
+    return dict(doc, items=items)
+
+def bases(folder):
+    '''{pack name: {(_id, name): document}} for every pack in a packs folder.'''
+    found = {}
+    for name in sorted(listdir(folder)):
+        if name.endswith('.db'):
+            found[name[:-3]] = {pack_key(line): json.loads(line) for line in read(join(folder, name))}
+    return found
+
+# # Size and load time report
+
+def _load_time(lines, repeat=3):
+    '''Best of repeat parses of every line, the way a module loading the pack would.'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines: json.loads(line)
+        best = min(best, time.perf_counter()-start)
+    return best
+
+def _decompress_time(path, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read(path)
+        best = min(best, time.perf_counter()-start)
+    return best
+
+def report(folder):
+    '''
+    For each pack in a packs folder: its lines, size and parse time, the size and read time of
+    each compressed copy beside it, and for packs with shared items, the same figures for the
+    embedded pack they stand for (the format without shared items).
+    '''
+    shared = bases(folder)
+    packs = {}
+    for name in sorted(n for n in listdir(folder) if n.endswith('.db')):
+        path = join(folder, name)
+        lines = read(path)
+        pack = {'lines': len(lines), 'bytes': getsize(path), 'load_seconds': round(_load_time(lines), 4)}
+        for method, suffix in SUFFIXES.items():
+            if exists(path+suffix):
+                pack[method] = {'bytes': getsize(path+suffix), 'read_seconds': round(_decompress_time(path+suffix), 4)}
+        if any('"pack": ' in line for line in lines):
+            embedded = [json.dumps(expand(json.loads(line), shared), ensure_ascii=False)+'\n' for line in lines]
+            pack['embedded'] = {'bytes': sum(len(line.encode('utf-8')) for line in embedded),
+                                'load_seconds': round(_load_time(embedded), 4)}
+        packs[name] = pack
+    return packs
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Reports the size and load time of a Foundry module's packs.")
+    parser.add_argument('folder', nargs='?', default='../../FoundryModule/packs')
+    parser.add_argument('--output', help='write the report here as JSON')
+    args = parser.parse_args(argv)
+
+    packs = report(args.folder)
+    for name, pack in packs.items():
+        line = f"{name}: {pack['lines']} lines, {pack['bytes']/1024:.0f} KiB, parsed in {pack['load_seconds']*1000:.0f}ms"
+        for method in SUFFIXES:
+            if method in pack: line += f", {method} {pack[method]['bytes']/1024:.0f} KiB read in {pack[method]['read_seconds']*1000:.0f}ms"
+        if 'embedded' in pack:
+            embedded = pack['embedded']
+            line += (f" (embedded: {embedded['bytes']/1024:.0f} KiB, {embedded['load_seconds']*1000:.0f}ms,"
+                     f" {embedded['bytes']/pack['bytes']:.1f}x larger)")
+        print(line)
+    if args.output:
+        open(args.output, 'w', encoding='utf-8').write(json.dumps(packs, indent=2))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,245 @@
+from collections.abc import Mapping, Sequence
+from array import array
+from sys import intern
+
+# Pokedex fields that are always stored as ints
+INTEGERS = ['BaseHP', 'Strength', 'MaxStrength', 'Dexterity', 'MaxDexterity', 'Vitality', 'MaxVitality',
+    'Special', 'MaxSpecial', 'Insight', 'MaxInsight']
+LEARNED_KEYS = ('Learned', 'Name')
+
+# Learnset move names and ranks, numbered once per process. Learnsets only hold the numbers.
+_move_names, _move_codes = [], {}
+_rank_names, _rank_codes = [], {}
+# Key order tuples, one shared copy per distinct order, and for Frozen objects {key: position}
+_orders = {}
+_positions = {}
+
+def _code(name, names, codes):
+    code = codes.get(name)
+    if code is None:
+        code = codes[name] = len(names)
+        names.append(name)
+    return code
+
+def _order(keys):
+    keys = tuple(keys)
+    return _orders.setdefault(keys, keys)
+
+def _position(keys):
+    keys = tuple(keys)
+    found = _positions.get(keys)
+    if found is None: found = _positions[keys] = {key: i for i, key in enumerate(keys)}
+    return found
+
+_LEARNED = _position(LEARNED_KEYS)
+_SCALARS = {str, int, float, bool, type(None)}
+
+def freeze(value):
+    '''An immutable copy of a parsed JSON value: dicts become Frozen, lists tuples, and strings are interned.'''
+    if isinstance(value, str): return intern(value)
+    if isinstance(value, dict): return Frozen(value)
+    if isinstance(value, list): return tuple(freeze(v) for v in value)
+    return value
+
+def thaw(value):
+    '''A plain, mutable copy of a frozen value, as json.loads would have returned it.'''
+    kind = type(value)
+    if kind in _SCALARS: return value
+    if kind is Frozen: return {k: thaw(v) for k, v in zip(value._positions, value._values)}
+    if kind is tuple: return [thaw(v) for v in value]
+    if kind is Learnset: return [{'Learned': rank, 'Name': name} for name, rank in value.pairs()]
+    if isinstance(value, Record): return value.to_dict()
+    return value
+
+class Frozen(Mapping):
+    '''
+    A read only JSON object: its values, and the positions of its keys, shared with every
+    object laid out the same.
+    '''
+    __slots__ = ('_positions', '_values')
+
+    def __init__(self, data=()):
+        data = dict(data)
+        object.__setattr__(self, '_positions', _position(data))
+        object.__setattr__(self, '_values', tuple(freeze(v) for v in data.values()))
+
+    @classmethod
+    def _make(cls, positions, values):
+        frozen = object.__new__(cls)
+        object.__setattr__(frozen, '_positions', positions)
+        object.__setattr__(frozen, '_values', values)
+        return frozen
+
+    def __getitem__(self, key):
+        return self._values[self._positions[key]]
+
+    def get(self, key, default=None):
+        i = self._positions.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Frozen objects are read only')
+
+    def __reduce__(self):
+        return (_unpickle_frozen, (tuple(self._positions), self._values))
+
+    def __repr__(self):
+        return f'Frozen({dict(self)!r})'
+
+def _unpickle_frozen(keys, values):
+    return Frozen._make(_position(keys), values)
+
+class Learnset(Sequence):
+    '''
+    A Pokemon's Moves as two arrays: a move number and a rank number per move learned. Items
+    read like the JSON they came from ({'Learned': rank, 'Name': move}), pairs() skips that.
+    '''
+    __slots__ = ('_moves', '_ranks')
+
+    def __init__(self, pairs):
+        moves, ranks = array('I'), bytearray()
+        for name, rank in pairs:
+            moves.append(_code(name, _move_names, _move_codes))
+            ranks.append(_code(rank, _rank_names, _rank_codes))
+        object.__setattr__(self, '_moves', moves)
+        object.__setattr__(self, '_ranks', bytes(ranks))
+
+    @classmethod
+    def parse(cls, moves):
+        '''A Learnset for a JSON list of moves, or None if it isn't laid out like the dataset's learnsets.'''
+        if not isinstance(moves, list) or len(_rank_names) > 250: return None
+        if not all(isinstance(m, dict) and tuple(m) == LEARNED_KEYS and isinstance(m['Name'], str) and isinstance(m['Learned'], str)
+                   for m in moves): return None
+        return cls((m['Name'], m['Learned']) for m in moves)
+
+    def pairs(self):
+        '''(move name, rank) for every move learned.'''
+        return [(_move_names[m], _rank_names[r]) for m, r in zip(self._moves, self._ranks)]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[j] for j in range(*i.indices(len(self)))]
+        return Frozen._make(_LEARNED, (_rank_names[self._ranks[i]], _move_names[self._moves[i]]))
+
+    def __iter__(self):
+        for m, r in zip(self._moves, self._ranks):
+            yield Frozen._make(_LEARNED, (_rank_names[r], _move_names[m]))
+
+    def __len__(self):
+        return len(self._moves)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Learnsets are read only')
+
+    def __reduce__(self):
+        # Move numbers are only good within one process, so names travel instead
+        return (Learnset, (self.pairs(),))
+
+    def __repr__(self):
+        return f'Learnset({self.pairs()!r})'
+
+class Record(Mapping):
+    '''
+    One dataset record, parsed and coerced once and read only after that, so engines, caches and
+    forked builds can all share it. Known fields live in slots and can be read as attributes or
+    keys (entry.Name, entry['Name']). Fields a category doesn't declare (from homebrew, say) are
+    kept too, in the file's key order. to_dict() gives a plain copy to build output from.
+    '''
+    __slots__ = ('_keys', '_extra')
+    _fields = frozenset()
+
+    def __init__(self, data):
+        extra = None
+        for key, value in data.items():
+            if key in self._fields: object.__setattr__(self, key, self._parse(key, value))
+            else:
+                if extra is None: extra = {}
+                extra[key] = freeze(value)
+        object.__setattr__(self, '_keys', _order(data))
+        object.__setattr__(self, '_extra', extra)
+
+    def _parse(self, key, value):
+        return freeze(value)
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._fields = frozenset(cls.__slots__)
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try: return getattr(self, key)
+            except AttributeError: raise KeyError(key) from None
+        if self._extra and key in self._extra: return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._fields: return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra else default
+
+    def __contains__(self, key):
+        if key in self._fields: return hasattr(self, key)
+        return bool(self._extra) and key in self._extra
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} records are read only')
+
+    def __delattr__(self, key):
+        raise AttributeError(f'{type(self).__name__} records are read only')
+
+    def __reduce__(self):
+        return (type(self), (self.to_dict(),))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.get('Name')!r}>"
+
+    def to_dict(self, *without):
+        '''A plain dict copy of the record, minus the keys in without, for output that changes it.'''
+        extra = self._extra
+        return {key: thaw(getattr(self, key) if extra is None or key not in extra else extra[key])
+                for key in self._keys if key not in without}
+
+class Pokemon(Record):
+    __slots__ = ('Number', 'DexID', 'Name', 'Type1', 'Type2', 'BaseHP', 'Strength', 'MaxStrength', 'Dexterity',
+        'MaxDexterity', 'Vitality', 'MaxVitality', 'Special', 'MaxSpecial', 'Insight', 'MaxInsight', 'Ability1',
+        'Ability2', 'HiddenAbility', 'EventAbilities', 'RecommendedRank', 'GenderType', 'Legendary', 'GoodStarter',
+        '_id', 'DexCategory', 'Height', 'Weight', 'DexDescription', 'Evolutions', 'Image', 'Moves', 'BookImageName',
+        'BookShinyImageName')
+
+    def _parse(self, key, value):
+        if key in INTEGERS: return int(value)
+        if key == 'Moves': return Learnset.parse(value) or freeze(value)
+        return freeze(value)
+
+class Move(Record):
+    __slots__ = ('Name', 'Type', 'Power', 'Damage1', 'Damage2', 'Accuracy1', 'Accuracy2', 'Target', 'Effect',
+        'Description', '_id', 'Attributes', 'AddedEffects', 'Category')
+
+class Ability(Record):
+    __slots__ = ('_id', 'Name', 'Effect', 'Description')
+
+class Item(Record):
+    __slots__ = ('Name', '_id', 'Source', 'Author', 'PMD', 'Pocket', 'Category', 'Description', 'OneUse', 'PMDPrice',
+        'TrainerPrice', 'ForTypes', 'ForPokemon', 'HealthRestored', 'Cures', 'Boost', 'Value', 'MaxMovePower', 'Image')
+
+class Nature(Record):
+    __slots__ = ('_id', 'Name', 'Nature', 'Confidence', 'Description', 'Keywords')
+
+RECORDS = {'Pokedex': Pokemon, 'Moves': Move, 'Abilities': Ability, 'Items': Item, 'Natures': Nature}
+
+def parse(category, data):
+    '''The record for a parsed JSON entry of category.'''
+    return RECORDS.get(category, Record)(data)
@@ -0,0 +1,180 @@
+from engine import Engine
+from catalog import RANKS
+from manifest import Manifest
+from records import thaw
+from collections.abc import Mapping, Sequence
+from os.path import join, exists
+from os import remove, replace, makedirs
+import sqlite3
+import json
+
+POKEDEX = ['_id', 'DexID', 'Number', 'Name', 'Type1', 'Type2', 'BaseHP', 'Strength', 'MaxStrength',
+    'Dexterity', 'MaxDexterity', 'Vitality', 'MaxVitality', 'Special', 'MaxSpecial', 'Insight',
+    'MaxInsight', 'Ability1', 'Ability2', 'HiddenAbility', 'EventAbilities', 'RecommendedRank',
+    'GenderType', 'Legendary', 'GoodStarter', 'DexCategory', 'DexDescription', 'Image',
+    'HeightMeters', 'HeightFeet', 'WeightKilograms', 'WeightPounds']
+MOVES = ['_id', 'Name', 'Type', 'Power', 'Damage1', 'Damage2', 'Accuracy1', 'Accuracy2', 'Target',
+    'Effect', 'Description', 'Category', 'Attributes', 'AddedEffects']
+ABILITIES = ['_id', 'Name', 'Effect', 'Description']
+ITEMS = ['_id', 'Name', 'Source', 'Author', 'PMD', 'Pocket', 'Category', 'Description', 'OneUse',
+    'PMDPrice', 'TrainerPrice', 'ForTypes', 'ForPokemon', 'HealthRestored', 'Cures', 'Boost', 'Value',
+    'MaxMovePower', 'Image']
+NATURES = ['_id', 'Name', 'Nature', 'Confidence', 'Keywords', 'Description']
+LEARNSETS = ['pokedex_id', 'Move', 'Learned', 'Rank']
+EVOLUTIONS = ['pokedex_id', 'Evolves', 'Pokemon', 'Kind', 'Speed', 'Item', 'Stat', 'Value', 'Special',
+    'Region', 'Gender', 'Move', 'Game', 'Stone']
+
+TABLES = {'pokedex': POKEDEX, 'moves': MOVES, 'abilities': ABILITIES, 'items': ITEMS, 'natures': NATURES}
+CATEGORY_TABLES = {'Pokedex': 'pokedex', 'Moves': 'moves', 'Abilities': 'abilities', 'Items': 'items', 'Natures': 'natures'}
+
+SCHEMA = '\n'.join(
+    [f'CREATE TABLE IF NOT EXISTS {t} (id INTEGER PRIMARY KEY, {", ".join(cols)});' for t, cols in TABLES.items()] +
+    [f'CREATE TABLE IF NOT EXISTS learnsets ({", ".join(LEARNSETS)}, FOREIGN KEY (pokedex_id) REFERENCES pokedex(id));',
+     f'CREATE TABLE IF NOT EXISTS evolutions ({", ".join(EVOLUTIONS)}, FOREIGN KEY (pokedex_id) REFERENCES pokedex(id));'] +
+    [f'CREATE INDEX IF NOT EXISTS {t}_{c.strip("_").replace("+", "_").lower()} ON {t} ({", ".join(c.split("+"))});' for t, c in [
+        ('pokedex', '_id'), ('pokedex', 'Name'), ('pokedex', 'DexID'), ('pokedex', 'Type1'), ('pokedex', 'Type2'),
+        ('pokedex', 'RecommendedRank'), ('moves', '_id'), ('moves', 'Name'), ('moves', 'Type'),
+        ('abilities', '_id'), ('abilities', 'Name'), ('items', '_id'), ('items', 'Name'), ('items', 'Pocket'),
+        ('natures', '_id'), ('natures', 'Name'), ('learnsets', 'pokedex_id'), ('learnsets', 'Move+Rank'),
+        ('learnsets', 'Rank'), ('evolutions', 'pokedex_id'), ('evolutions', 'Pokemon'),
+    ]]
+)
+
+def _column(value):
+    '''SQLite takes scalars only, anything nested is stored as JSON text.'''
+    if isinstance(value, str): return value
+    return json.dumps(thaw(value), ensure_ascii=False) if isinstance(value, (Mapping, Sequence)) else value
+
+def _row(columns, entry):
+    return tuple(_column(entry.get(c)) for c in columns)
+
+class SQLite_Engine(Engine):
+    '''
+    Writes the dataset to a single SQLite file with a table per category, plus learnsets
+    (Pokemon x Move x Learned, with Rank as a number so ranks compare) and evolutions.
+    Rows are staged as the driver goes and inserted in bulk, in one transaction, on close.
+
+    All Fire moves learnable by Ace rank, for example:
+        SELECT DISTINCT moves.Name FROM moves JOIN learnsets ON learnsets.Move = moves.Name
+        WHERE moves.Type = 'Fire' AND learnsets.Rank <= 5
+    '''
+
+    # 2: Pokemon record their learnset moves as dependencies, older manifests don't have them
+    VERSION = 2
+
+    def __init__(self, output_path, game_version, clean=True):
+        super().__init__(output_path, game_version)
+        self.db_path = join(output_path, f'pokerole-{game_version}.sqlite')
+        self.ranks = {rank: i for i, rank in enumerate(RANKS.get(game_version, []))}
+        self.staged = []
+        self.discarded = []
+        if clean: self.clean()
+
+    def clean(self):
+        if exists(self.db_path): remove(self.db_path)
+
+    def open_manifest(self):
+        # Every game version's database goes in the same folder
+        return Manifest(self.output_path, self.build_key(), f'.pokerole-{self.game_version}.build-manifest.json')
+
+    def _stage(self, table, row, learnsets=(), evolutions=()):
+        if self._deferred is not None:
+            self._deferred.append(('_stage', (table, row, learnsets, evolutions)))
+            return
+        self.staged.append((table, row, learnsets, evolutions))
+        self._count(f'{table}_rows')
+
+    def pokedex_entry(self, entry, write=True):
+        entry = dict(entry,
+            HeightMeters=entry['Height']['Meters'], HeightFeet=entry['Height']['Feet'],
+            WeightKilograms=entry['Weight']['Kilograms'], WeightPounds=entry['Weight']['Pounds'])
+        row = _row(POKEDEX, entry)
+        catalog = self.driver.catalog
+        learnsets = []
+        for move in entry['Moves']:
+            # Learnsets name moves by file, stored moves go by their Name field
+            found = catalog.get('Moves', move['Name'])
+            name = found['Name'] if found else move['Name']
+            learnsets.append((name, move['Learned'], self.ranks.get(move['Learned'])))
+        evolutions = []
+        for evo in entry.get('Evolutions', []):
+            evolves = 'To' if evo.get('To') else 'From'
+            evo = dict(evo, Evolves=evolves, Pokemon=evo.get(evolves))
+            evolutions.append(_row(EVOLUTIONS[1:], evo))
+        if write: self._stage('pokedex', row, learnsets, evolutions)
+        return {'pokedex': row, 'learnsets': learnsets, 'evolutions': evolutions}
+
+    def movedex_entry(self, entry, write=True):
+        row = _row(MOVES, entry)
+        if write: self._stage('moves', row)
+        return {'moves': row}
+
+    def abilitydex_entry(self, entry, write=True):
+        row = _row(ABILITIES, entry)
+        if write: self._stage('abilities', row)
+        return {'abilities': row}
+
+    def itemdex_entry(self, entry, write=True):
+        row = _row(ITEMS, entry)
+        if write: self._stage('items', row)
+        return {'items': row}
+
+    def naturedex_entry(self, entry, write=True):
+        row = _row(NATURES, entry)
+        if write: self._stage('natures', row)
+        return {'natures': row}
+
+    def dependencies(self, category, entry):
+        # Learnset rows store each move's Name, so renaming a move rewrites its learners
+        if category != 'Pokedex': return []
+        return [('Moves', x['Name']) for x in entry['Moves']]
+
+    def discard(self, category, record):
+        self.discarded.append((CATEGORY_TABLES[category], record['_id'], record['name']))
+
+    def _delete(self, con, table, _id, name):
+        ids = [r[0] for r in con.execute(f'SELECT id FROM {table} WHERE _id IS ? AND Name IS ?', (_id, name))]
+        con.executemany(f'DELETE FROM {table} WHERE id = ?', [(i,) for i in ids])
+        if table == 'pokedex':
+            con.executemany('DELETE FROM learnsets WHERE pokedex_id = ?', [(i,) for i in ids])
+            con.executemany('DELETE FROM evolutions WHERE pokedex_id = ?', [(i,) for i in ids])
+
+    def close(self):
+        '''
+        Inserts everything staged. Full builds go to a temp file that replaces the database at
+        the end, incremental ones replace their records in the existing database.
+        '''
+        super().close()
+        merge = self.packs.merge and exists(self.db_path)
+        makedirs(self.output_path, exist_ok=True)
+        path = self.db_path if merge else self.db_path+'.tmp'
+        if not merge and exists(path): remove(path)
+
+        con = sqlite3.connect(path)
+        con.executescript(SCHEMA)
+        with con:
+            if merge:
+                for table, _id, name in self.discarded:
+                    self._delete(con, table, _id, name)
+                for table, row, _, _ in self.staged:
+                    self._delete(con, table, row[0], row[TABLES[table].index('Name')])
+            next_id = {t: con.execute(f'SELECT COALESCE(MAX(id), 0) FROM {t}').fetchone()[0] + 1 for t in TABLES}
+            rows = {t: [] for t in TABLES}
+            learnsets, evolutions = [], []
+            for table, row, learned, evolved in self.staged:
+                i = next_id[table]
+                next_id[table] += 1
+                rows[table].append((i,) + row)
+                learnsets.extend((i,) + l for l in learned)
+                evolutions.extend((i,) + e for e in evolved)
+            for table, cols in TABLES.items():
+                con.executemany(f'INSERT INTO {table} VALUES ({", ".join("?" * (len(cols)+1))})', rows[table])
+            con.executemany(f'INSERT INTO learnsets VALUES ({", ".join("?" * len(LEARNSETS))})', learnsets)
+            con.executemany(f'INSERT INTO evolutions VALUES ({", ".join("?" * len(EVOLUTIONS))})', evolutions)
+        con.close()
+        if not merge: replace(path, self.db_path)
+        self.staged, self.discarded = [], []
+
+    def abort(self):
+        super().abort()
+        self.staged, self.discarded = [], []
@@ -1,38 +1,59 @@
 from engine import Engine
-from os.path import join
-import yaml
-import pandas as pd
-from shutil import rmtree
+from srd_templates import SRD_Templates, pipe_table
+from records import Learnset
+from os.path import join, exists
+from os import remove
+import front_matter
 
 VERBOSE = True
+FOLDERS = {'Pokedex': 'SRD-Pokedex', 'Moves': 'SRD-Moves', 'Abilities': 'SRD-Abilities', 'Items': 'SRD-Items', 'Natures': 'SRD-Natures'}
+LEARNSET_RANKS = ['Starter','Beginner','Amateur','Ace','Pro','Rookie','Standard','Advanced','Expert']
+STATS = ['Strength', 'Dexterity', 'Vitality', 'Special', 'Insight']
 
 class SRD_Engine(Engine):
     
-    def __init__(self, output_path, game_version):
+    IMAGE_FOLDERS = ('SRD-BookSprites', 'SRD-HomeSprites', 'SRD-BoxSprites', 'SRD-ShuffleTokens', 'SRD-ItemSprites')
+    
+    def __init__(self, output_path, game_version, clean=True):
         super().__init__(output_path, game_version)
         self.in_vault_path = join("Pokerole SRD", f"SRD {self.game_version}")
         self.output_path = join(output_path, "Pokerole SRD", f"SRD {self.game_version}")
+        self.templates = SRD_Templates(game_version)
         # Wipe out the Output folder you provided. 
-        rmtree(self.output_path, ignore_errors=True)
+        if clean: self.clean()
+    
+    def dependencies(self, category, entry):
+        # Pokemon pages list their learnset and link their abilities and evolutions by name
+        if category != 'Pokedex': return []
+        moves = [('Moves', x['Name']) for x in entry['Moves']]
+        abilities = [('Abilities', entry[x]) for x in ['Ability1', 'Ability2', 'HiddenAbility', 'EventAbilities'] if entry.get(x)]
+        evolutions = [('Pokedex', x.get('To') or x.get('From')) for x in entry.get('Evolutions', [])]
+        return moves + abilities + evolutions
+    
+    def discard(self, category, record):
+        postfix = '-v2.0' if self.game_version == 'v2.0' and category != 'Natures' else ''
+        path = join(self.output_path, FOLDERS[category], f"SRD-{record['name']}{postfix}.md")
+        if exists(path): remove(path)
     
     def pokedex_entry(self, entry, write=True):
-        # Entry dict is also going to be used for the yml metadata. 
+        # A copy of the entry is also going to be used for the yml metadata. 
         # if VERBOSE: print(entry['Name'])
+        metadata = entry.to_dict('DexID', '_id', 'Moves')
         name = entry['Name']
         sname = entry['Image'].split('.')
-        entry['BookSprite'] = f"SRD-{sname[0]}-BookSprite.{sname[1]}"
-        entry['HomeSprite'] = f"SRD-{sname[0]}-HomeSprite.{sname[1]}"
+        metadata['BookSprite'] = f"SRD-{sname[0]}-BookSprite.{sname[1]}"
+        metadata['HomeSprite'] = f"SRD-{sname[0]}-HomeSprite.{sname[1]}"
         postfix = '-v2.0' if self.game_version == 'v2.0' else ''
         # entry['BoxSprite'] = f"SRD-{sname[0]}-BoxSprite.{sname[1]}"
         # entry['ShuffleToken'] = f"SRD-{sname[0]}-ShuffleToken.{sname[1]}"
         
         # entry['Legendary'] = 'Yes' if entry['Legendary'] else 'No'
         # goodstarter = 'Yes' if entry['GoodStarter'] else 'No'
-        entry.update(self._learnset_gen(entry['Moves']))
+        metadata.update(self._learnset_gen(entry['Moves']))
         
         
-        if entry.get('Evolutions'):
-            evocopy = entry['Evolutions'].copy()
+        if metadata.get('Evolutions'):
+            evocopy = metadata['Evolutions'].copy()
             for dat in evocopy:
                 if dat.get('To'):
                     dat['Pokemon'] = f"[[SRD-{dat.get('To')}]]"
@@ -42,65 +63,45 @@ class SRD_Engine(Engine):
                     dat['Pokemon'] = f"[[SRD-{dat.get('From')}]]"
                     dat['Evolves'] = 'From'
                     del dat['From']
-            evodf = pd.DataFrame(evocopy)
-            colorder = ['Evolves', 'Pokemon', 'Kind'] + [x for x in list(evodf.columns) if x not in ['Evolves', 'Pokemon', 'Kind']]
-            evodf = evodf.reindex(columns=colorder).fillna('')
-            evostring='\n'+evodf.to_markdown(index=0)+'\n'
+            columns = []
+            for dat in evocopy:
+                columns.extend(x for x in dat if x not in columns)
+            colorder = ['Evolves', 'Pokemon', 'Kind'] + [x for x in columns if x not in ['Evolves', 'Pokemon', 'Kind']]
+            evostring='\n'+pipe_table(evocopy, colorder)+'\n'
         else: evostring = ""
         
         height = str(entry['Height']['Feet'])
         feet = height.split('.')[0]
         inches = height.split('.')[1] if '.' in height else 0 
-        abilities = (f"[[SRD-{entry['Ability1']}{postfix}|{entry['Ability1']}]]"
-                            f"{'' if not entry['Ability2'] else ' / [[SRD-'+ entry['Ability2']+postfix+'|'+entry['Ability2']+']]'}"
-                            f"{'' if not entry['HiddenAbility'] else ' ([[SRD-'+entry['HiddenAbility']+postfix+'|'+entry['HiddenAbility']+']])'}"
-                            f"{'' if not entry['EventAbilities'] else ' <[[SRD-'+entry['EventAbilities']+postfix+'|'+entry['EventAbilities']+']]>'}"
-                            )
-        INTEGERS = ['BaseHP', 'Strength', 'MaxStrength',
-        'Dexterity', 'MaxDexterity', 'Vitality', 'MaxVitality', 'Special',
-        'MaxSpecial', 'Insight', 'MaxInsight']
-        for key in INTEGERS:
-            entry[key] = int(entry[key])
-        learnset = "Embedded Views.base#Learnsets " + self.game_version
-            
-        entry_template = open('resources/srd_pokedex_template.txt').read()
-        entry_output = entry_template.format( 
-            name=name, 
-            booksprite=entry['BookSprite'], 
-            homesprite=entry['HomeSprite'], 
-            # boxsprite=entry['BoxSprite'], 
-            # shuffletoken=entry['ShuffleToken'], 
-            dexcategory=entry['DexCategory'], 
-            dexdescription=entry['DexDescription'], 
-            dexid=entry['DexID'], 
-            typeline=entry['Type1']+(f' / {entry["Type2"]}' if entry['Type2'] else ''), 
-            abilities=abilities, 
-            basehp=entry["BaseHP"], 
-            strengthdots = ('⬤'*entry['Strength'])+('⭘'*(entry['MaxStrength']-entry['Strength'])),
-            strengthraw = str(entry["Strength"])+'/'+str(entry['MaxStrength']),
-            dexteritydots = ('⬤'*entry['Dexterity'])+('⭘'*(entry['MaxDexterity']-entry['Dexterity'])),
-            dexterityraw = str(entry["Dexterity"])+'/'+str(entry['MaxDexterity']),
-            vitalitydots = ('⬤'*entry['Vitality'])+('⭘'*(entry['MaxVitality']-entry['Vitality'])),
-            vitalityraw = str(entry["Vitality"])+'/'+str(entry['MaxVitality']),
-            specialdots = ('⬤'*entry['Special'])+('⭘'*(entry['MaxSpecial']-entry['Special'])),
-            specialraw = str(entry["Special"])+'/'+str(entry['MaxSpecial']),
-            insightdots = ('⬤'*entry['Insight'])+('⭘'*(entry['MaxInsight']-entry['Insight'])),
-            insightraw = str(entry["Insight"])+'/'+str(entry['MaxInsight']),
-            feet=feet, 
-            inches=inches,
-            meters=entry['Height']['Meters'], 
-            pounds=entry['Weight']['Pounds'],
-            kilograms=entry['Weight']['Kilograms'], 
-            goodstarter= 'Yes' if entry['GoodStarter'] else 'No', 
-            recommendedrank=entry['RecommendedRank'], 
-            evostring=evostring,
-            learnset=learnset,
-            self_in_vault=join(self.in_vault_path, 'SRD-Pokedex', f"SRD-{name}.md")
-        )
         
-        for x in ['DexID', '_id', 'Moves']:
-                del entry[x]
-        entry_output = f"---\n{yaml.dump(entry)}---\n\n#PokeroleSRD/Pokedex\n\n{entry_output}"
+        templates = self.templates
+        values = {
+            'name': name, 
+            'booksprite': metadata['BookSprite'], 
+            'homesprite': metadata['HomeSprite'], 
+            'dexcategory': entry['DexCategory'], 
+            'dexdescription': entry['DexDescription'], 
+            'dexid': entry['DexID'], 
+            'typeline': entry['Type1']+(f' / {entry["Type2"]}' if entry['Type2'] else ''), 
+            'abilities': templates.abilities_line(entry), 
+            'basehp': entry["BaseHP"], 
+            'feet': feet, 
+            'inches': inches,
+            'meters': entry['Height']['Meters'], 
+            'pounds': entry['Weight']['Pounds'],
+            'kilograms': entry['Weight']['Kilograms'], 
+            'goodstarter': 'Yes' if entry['GoodStarter'] else 'No', 
+            'recommendedrank': entry['RecommendedRank'], 
+            'evostring': evostring,
+            'learnset': "Embedded Views.base#Learnsets " + self.game_version,
+        }
+        for stat in STATS:
+            value, maximum = entry[stat], entry['Max'+stat]
+            values[stat.lower()+'dots'] = templates.dots(value, maximum)
+            values[stat.lower()+'raw'] = f"{value}/{maximum}"
+        
+        values['frontmatter'] = front_matter.dump(metadata)
+        entry_output = templates.pokedex.render(values)
         
         path = join(self.output_path,'SRD-Pokedex', f"SRD-{name}{postfix}.md")
         self._write_to(entry_output, path)
@@ -108,42 +109,20 @@ class SRD_Engine(Engine):
         return entry_output
     
     def _learnset_gen(self, stored_moves):
-        ranks = ['Starter','Beginner','Amateur','Ace','Pro','Rookie','Standard','Advanced','Expert']
-        moves = {}
-        for k in ranks:
-            moves[k+'Moves'] = [m['Name'] for m in stored_moves if m['Learned'] == k]
+        moves = {k+'Moves': [] for k in LEARNSET_RANKS}
+        pairs = stored_moves.pairs() if isinstance(stored_moves, Learnset) else [(m['Name'], m['Learned']) for m in stored_moves]
+        for name, learned in pairs:
+            if learned in LEARNSET_RANKS: moves[learned+'Moves'].append(name)
         return moves
         
     def movedex_entry(self, entry, write=True):
-        moves_template = (
-        '''### `= this.name`\n'''
-        '''*`= this.Description`*\n'''
-        '''\n'''
-        '''**Accuracy:** `= this.Accuracy1` + `= this.Accuracy2`\n'''
-        '''**Damage:** `= this.Power` `= choice(length(this.Damage1)=0, "","\+ "+ this.Damage1)` `= choice(length(this.Damage2)=0, "","\+ "+ this.Damage2)`\n'''
-        '''\n'''
-        '''| Type          | Target          | Category          | Power          |\n'''
-        '''| ------------- | --------------- | ----------------  | -------------- |\n'''
-        '''| `= this.Type` | `= this.Target` | `= this.Category` | `= this.Power` | \n'''
-        '''\n'''
-        '''**Effect:** `= this.Effect`'''
-        )
-        del entry['_id']
-        entry_output = f"---\n{yaml.dump(entry)}---\n\n#PokeroleSRD/Moves\n\n{moves_template}"
+        entry_output = self.templates.moves.render({'frontmatter': front_matter.dump(entry.to_dict('_id'))})
         postfix = '-v2.0' if self.game_version == 'v2.0' else ''
         path = join(self.output_path,'SRD-Moves', f"SRD-{entry['Name']}{postfix}.md")
         self._write_to(entry_output, path)
     
     def abilitydex_entry(self, entry, write=True):
-        ability_template = (
-            '''## `= this.name`\n'''
-            '''\n'''
-            '''> *`= this.Description`*\n'''
-            '''\n'''
-            '''**Effect:** `= this.Effect`'''
-            )
-        del entry['_id']
-        entry_output = f"---\n{yaml.dump(entry)}---\n\n#PokeroleSRD/Abilities\n\n{ability_template}"
+        entry_output = self.templates.abilities.render({'frontmatter': front_matter.dump(entry.to_dict('_id'))})
         postfix = '-v2.0' if self.game_version == 'v2.0' else ''
         path = join(self.output_path,'SRD-Abilities', f"SRD-{entry['Name']}{postfix}.md")
         self._write_to(entry_output, path)
@@ -151,41 +130,17 @@ class SRD_Engine(Engine):
     def itemdex_entry(self, entry, write=True):
         
         img = entry.get('_id', None)
+        entry = entry.to_dict('_id')
         entry['Image'] = f'SRD-{img}-ItemSprite.png'
         img = f"![[{entry['Image']}|right]]\n" if img else ""
         
-        items_template = (
-                f'''## `= this.Name`\n'''
-                f'''\n'''
-                f'''{img}'''
-                f'''\n'''
-                f'''*`= this.Description`*\n'''
-                f'''\n'''
-                f'''| Trainer Price           | PMD Price         | Source | \n'''
-                f'''| ----------------------- | ----------------- | ------ |\n'''
-                f'''| `= this.SuggestedPrice` | `= this.PMDPrice` | `= this.Source`\n'''
-                f'''\n'''
-                f'''**Pokemon Limitation**: `= this.SpecificPokemon`\n'''
-                )
-        del entry['_id']
-        
-        entry_output = f"---\n{yaml.dump(entry)}---\n\n#PokeroleSRD/Items\n\n{items_template}"
+        entry_output = self.templates.items.render({'frontmatter': front_matter.dump(entry), 'img': img})
         postfix = '-v2.0' if self.game_version == 'v2.0' else ''
         path = join(self.output_path,'SRD-Items', f"SRD-{entry['Name']}{postfix}.md")
         self._write_to(entry_output, path)
     
     def nature_entry(self, entry, write=True):
-        natures_template = (
-            '''## `= this.Nature`\n'''
-            '''\n'''
-            '''**Confidence**: `= this.Confidence`\n'''
-            '''\n'''
-            '''*`= this.Keywords`*\n'''
-            '''\n'''
-            '''> `= this.Description`'''
-            )
-        del entry['_id']
-        entry_output = f"---\n{yaml.dump(entry)}---\n\n#PokeroleSRD/Natures\n\n{natures_template}"
+        entry_output = self.templates.natures.render({'frontmatter': front_matter.dump(entry.to_dict('_id'))})
         path = join(self.output_path,'SRD-Natures', f"SRD-{entry['Name']}.md")
         self._write_to(entry_output, path)
     
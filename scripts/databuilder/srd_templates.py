@@ -0,0 +1,165 @@
+from os.path import join, dirname
+from string import Formatter
+
+RESOURCES = join(dirname(__file__), 'resources')
+FULL_DOT, EMPTY_DOT = '⬤', '⭘'
+
+def _page(tag, body):
+    '''YAML front matter, the SRD tag, then the page body.'''
+    return Template('---\n{frontmatter}---\n\n#PokeroleSRD/'+tag+'\n\n'+body)
+
+MOVE_TEMPLATE = (
+    '''### `= this.name`\n'''
+    '''*`= this.Description`*\n'''
+    '''\n'''
+    '''**Accuracy:** `= this.Accuracy1` + `= this.Accuracy2`\n'''
+    '''**Damage:** `= this.Power` `= choice(length(this.Damage1)=0, "","\\+ "+ this.Damage1)` `= choice(length(this.Damage2)=0, "","\\+ "+ this.Damage2)`\n'''
+    '''\n'''
+    '''| Type          | Target          | Category          | Power          |\n'''
+    '''| ------------- | --------------- | ----------------  | -------------- |\n'''
+    '''| `= this.Type` | `= this.Target` | `= this.Category` | `= this.Power` | \n'''
+    '''\n'''
+    '''**Effect:** `= this.Effect`'''
+)
+
+ABILITY_TEMPLATE = (
+    '''## `= this.name`\n'''
+    '''\n'''
+    '''> *`= this.Description`*\n'''
+    '''\n'''
+    '''**Effect:** `= this.Effect`'''
+)
+
+ITEM_TEMPLATE = (
+    '''## `= this.Name`\n'''
+    '''\n'''
+    '''{img}'''
+    '''\n'''
+    '''*`= this.Description`*\n'''
+    '''\n'''
+    '''| Trainer Price           | PMD Price         | Source | \n'''
+    '''| ----------------------- | ----------------- | ------ |\n'''
+    '''| `= this.SuggestedPrice` | `= this.PMDPrice` | `= this.Source`\n'''
+    '''\n'''
+    '''**Pokemon Limitation**: `= this.SpecificPokemon`\n'''
+)
+
+NATURE_TEMPLATE = (
+    '''## `= this.Nature`\n'''
+    '''\n'''
+    '''**Confidence**: `= this.Confidence`\n'''
+    '''\n'''
+    '''*`= this.Keywords`*\n'''
+    '''\n'''
+    '''> `= this.Description`'''
+)
+
+class Template(object):
+    '''
+    A str.format template parsed once into its literal chunks and field names. Rendering
+    joins the chunks around the values in one pass, without parsing the template again.
+    '''
+
+    def __init__(self, text):
+        self.chunks, self.fields = [''], []
+        for literal, field, _, _ in Formatter().parse(text):
+            self.chunks[-1] += literal
+            if field is not None:
+                self.fields.append(field)
+                self.chunks.append('')
+
+    def render(self, values):
+        out = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            out.append(str(values[field]))
+            out.append(chunk)
+        return ''.join(out)
+
+class SRD_Templates(object):
+    '''
+    Every SRD page template for a game version, compiled once per engine, plus caches of the
+    fragments pages share: stat dot strings per (value, max) and ability links per ability.
+    '''
+
+    def __init__(self, game_version, resources=RESOURCES):
+        self.postfix = '-v2.0' if game_version == 'v2.0' else ''
+        pokedex = open(join(resources, 'srd_pokedex_template.txt'), encoding='utf-8').read()
+        self.pokedex = _page('Pokedex', pokedex)
+        self.moves = _page('Moves', MOVE_TEMPLATE)
+        self.abilities = _page('Abilities', ABILITY_TEMPLATE)
+        self.items = _page('Items', ITEM_TEMPLATE)
+        self.natures = _page('Natures', NATURE_TEMPLATE)
+        self._dots = {}
+        self._links = {}
+
+    def dots(self, value, maximum):
+        '''⬤ for every point, ⭘ for every point left up to the maximum.'''
+        key = (value, maximum)
+        dots = self._dots.get(key)
+        if dots is None:
+            dots = self._dots[key] = FULL_DOT*value + EMPTY_DOT*(maximum-value)
+        return dots
+
+    def link(self, ability):
+        link = self._links.get(ability)
+        if link is None:
+            link = self._links[ability] = f"[[SRD-{ability}{self.postfix}|{ability}]]"
+        return link
+
+    def abilities_line(self, entry):
+        '''Ability1 / Ability2 (HiddenAbility) <EventAbilities>, each linked to its page.'''
+        line = self.link(entry['Ability1'])
+        if entry['Ability2']: line += ' / ' + self.link(entry['Ability2'])
+        if entry['HiddenAbility']: line += ' (' + self.link(entry['HiddenAbility']) + ')'
+        if entry['EventAbilities']: line += ' <' + self.link(entry['EventAbilities']) + '>'
+        return line
+
+EMPTY, BOOL, INT, FLOAT, TEXT = range(5)
+
+def _parses(kind, text):
+    try: kind(text)
+    except (TypeError, ValueError): return False
+    return True
+
+def _cell_type(value):
+    '''tabulate's guess at a cell's type. A column takes the most general type of its cells.'''
+    if value is None or value == '': return EMPTY
+    if isinstance(value, bool) or value in ('True', 'False'): return BOOL
+    if isinstance(value, int) or (isinstance(value, str) and _parses(int, value)): return INT
+    if isinstance(value, float) or (isinstance(value, str) and _parses(float, value)): return FLOAT
+    return TEXT
+
+def _decimals(text):
+    '''Digits after the decimal point or exponent, -1 for whole numbers and text.'''
+    if not _parses(float, text) or _parses(int, text): return -1
+    point = text.rfind('.')
+    if point < 0: point = text.lower().rfind('e')
+    return len(text)-point-1 if point >= 0 else -1
+
+def _cell(value, kind):
+    if value is None or value == '': return ''
+    if kind == FLOAT and _parses(float, value): return format(float(value), 'g')
+    return str(value)
+
+def pipe_table(rows, columns):
+    '''
+    rows (dicts) as a Markdown pipe table over columns, missing cells left blank. The same
+    text pandas' to_markdown(index=0) gives through tabulate: int and float columns are right
+    aligned on their decimal point, everything else left aligned, cells are stripped and every
+    column is at least two characters wider than its header.
+    '''
+    table, rule = [], []
+    for column in columns:
+        cells = [row.get(column) for row in rows]
+        kind = max([BOOL] + [_cell_type(c) for c in cells])
+        texts = [_cell(c, kind).strip() for c in cells]
+        if kind in (INT, FLOAT):
+            most = max(_decimals(t) for t in texts)
+            pad, texts = str.rjust, [t + ' '*(most-_decimals(t)) for t in texts]
+        else:
+            pad = str.ljust
+        width = max([len(column)+2] + [len(t) for t in texts])
+        table.append([pad(t, width) for t in [column] + texts])
+        rule.append(':'+'-'*(width+1) if pad is str.ljust else '-'*(width+1)+':')
+    lines = ['| ' + ' | '.join(row) + ' |' for row in zip(*table)]
+    return '\n'.join(lines[:1] + ['|' + '|'.join(rule) + '|'] + lines[1:])
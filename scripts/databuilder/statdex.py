@@ -0,0 +1,96 @@
+from catalog import Catalog, RANKS
+import numpy as np
+
+ATTRIBUTES = ['BaseHP', 'Strength', 'MaxStrength', 'Dexterity', 'MaxDexterity', 'Vitality', 'MaxVitality',
+    'Special', 'MaxSpecial', 'Insight', 'MaxInsight']
+
+class StatDex(object):
+    '''
+    The Pokedex as columns: one row per form, a species x attribute stat matrix, and type and
+    rank codes, so filters and sorts over every form are single vectorized passes.
+
+    Masks combine with & and |, then select() turns them into row indexes:
+
+        dex = StatDex.from_folder('../../', 'v3.0')
+        rows = dex.select(dex.has_type('Water') & (dex['MaxSpecial'] >= 5) & dex.rank_at_most('Advanced'),
+                          sort='MaxSpecial', descending=True)
+        dex.names[rows]
+
+    query() wraps the common case in keywords.
+    '''
+
+    def __init__(self, entries, game_version):
+        self.game_version = game_version
+        self.ranks = RANKS.get(game_version, [])
+        self.names = np.array([e['Name'] for e in entries], dtype=object)
+        self.dexids = np.array([e['DexID'] for e in entries], dtype=object)
+        self.ids = np.array([e['_id'] for e in entries], dtype=object)
+        self.stats = np.array([[int(e[a]) for a in ATTRIBUTES] for e in entries], dtype=np.int16).reshape(-1, len(ATTRIBUTES))
+
+        # Type code 0 is "no type", so Type2 of a single typed Pokemon never matches anything
+        self.types = [''] + sorted(({e['Type1'] for e in entries} | {e['Type2'] for e in entries}) - {''})
+        codes = {t: i for i, t in enumerate(self.types)}
+        self.type1 = np.array([codes[e['Type1']] for e in entries], dtype=np.int8)
+        self.type2 = np.array([codes[e['Type2']] for e in entries], dtype=np.int8)
+
+        # Rank codes follow RANKS order, -1 for a rank this version doesn't know
+        ranks = {r: i for i, r in enumerate(self.ranks)}
+        self.rank = np.array([ranks.get(e['RecommendedRank'], -1) for e in entries], dtype=np.int8)
+        self.legendary = np.array([bool(e['Legendary']) for e in entries], dtype=bool)
+        self.good_starter = np.array([bool(e['GoodStarter']) for e in entries], dtype=bool)
+
+    @classmethod
+    def from_folder(cls, root='../../', game_version='v3.0'):
+        return cls.from_catalog(Catalog(root, game_version))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls([entry for _, entry in catalog.entries('Pokedex')], catalog.game_version)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, attribute):
+        '''One attribute's column, e.g. dex['MaxSpecial'].'''
+        return self.stats[:, ATTRIBUTES.index(attribute)]
+
+    # # Masks
+
+    def has_type(self, *types):
+        codes = [self.types.index(t) for t in types if t in self.types]
+        return np.isin(self.type1, codes) | np.isin(self.type2, codes)
+
+    def rank_at_most(self, rank):
+        return (self.rank >= 0) & (self.rank <= self.ranks.index(rank))
+
+    def rank_at_least(self, rank):
+        return self.rank >= self.ranks.index(rank)
+
+    def everything(self):
+        return np.ones(len(self), dtype=bool)
+
+    # # Selection
+
+    def select(self, mask=None, sort=None, descending=False):
+        '''Row indexes where mask is set, optionally ordered by an attribute (ties keep dex order).'''
+        rows = np.flatnonzero(self.everything() if mask is None else mask)
+        if sort:
+            keys = self[sort][rows]
+            order = np.argsort(-keys if descending else keys, kind='stable')
+            rows = rows[order]
+        return rows
+
+    def query(self, types=(), max_rank=None, min_rank=None, legendary=None, minimum={}, maximum={},
+              sort=None, descending=False):
+        '''
+        Names of every form matching all the given filters, e.g.
+        query(types=['Water'], minimum={'MaxSpecial': 5}, max_rank='Advanced')
+        '''
+        mask = self.everything()
+        if types: mask &= self.has_type(*types)
+        if max_rank: mask &= self.rank_at_most(max_rank)
+        if min_rank: mask &= self.rank_at_least(min_rank)
+        if legendary is not None: mask &= self.legendary == legendary
+        for attribute, value in minimum.items(): mask &= self[attribute] >= value
+        for attribute, value in maximum.items(): mask &= self[attribute] <= value
+        return list(self.names[self.select(mask, sort, descending)])
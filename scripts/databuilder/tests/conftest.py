@@ -0,0 +1,5 @@
+# The databuilder modules import each other by bare name, as when run from scripts/databuilder
+import sys
+from os.path import dirname, abspath
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
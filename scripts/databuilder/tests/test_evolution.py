@@ -0,0 +1,29 @@
+from evolution import EvolutionGraph, variant
+import pytest
+
+# Slowpoke's line as the v3.0 Pokedex has it: Slowbro's only Mega has a bare M suffix
+SLOWPOKE = [
+    ('Pokedex/Slowpoke.json', {'DexID': '0079', 'Name': 'Slowpoke', 'Evolutions': [
+        {'To': 'Slowbro', 'Kind': 'Special', 'Special': 'Shellder Biting Tail'}]}),
+    ('Pokedex/Slowbro.json', {'DexID': '0080', 'Name': 'Slowbro', 'Evolutions': [
+        {'From': 'Slowpoke', 'Kind': 'Special', 'Special': 'Shellder Biting Tail'},
+        {'To': 'Slowbro (Mega Form)', 'Kind': 'Mega', 'Item': 'Slowbronite'}]}),
+    ('Pokedex/Slowbro (Mega Form).json', {'DexID': '0080M', 'Name': 'Slowbro (Mega Form)', 'Evolutions': [
+        {'From': 'Slowbro', 'Kind': 'Mega', 'Item': 'Slowbronite'}]}),
+]
+
+@pytest.mark.parametrize('dexid, kind', [
+    ('0080', None), ('0080M', 'mega'), ('0006M1', 'mega'), ('0006M2', 'mega'), ('0150X', 'mega'),
+    ('0052G', 'regional'), ('0128PA', 'regional'), ('0025F1', 'form'),
+])
+def test_variant(dexid, kind):
+    assert variant(dexid) == kind
+
+def test_bare_m_mega():
+    graph = EvolutionGraph(SLOWPOKE)
+    assert graph.inconsistencies == []
+    # A Mega changes form, it doesn't add a stage
+    assert graph.stage_of('0080M') == graph.stage_of('0080') == 2
+    assert '0080M' in graph.all_descendants('Slowpoke')
+    nodes = {dexid: kind for dexid, _, _, kind in graph.adjacency()['nodes']}
+    assert nodes == {'0079': None, '0080': None, '0080M': 'mega'}
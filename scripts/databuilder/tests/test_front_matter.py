@@ -0,0 +1,19 @@
+from front_matter import dump
+from os.path import join, dirname
+from glob import glob
+import json
+import pytest
+
+# Each golden/front_matter/{name}.json record, and the front matter it has to come out as,
+# written by yaml.dump when the fixture was made. Regenerate them only on purpose.
+GOLDEN = join(dirname(__file__), 'golden', 'front_matter')
+CASES = sorted(path[:-len('.json')] for path in glob(join(GOLDEN, '*.json')))
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: case.split('/')[-1])
+def test_dump_matches_golden(case):
+    entry = json.load(open(case+'.json', encoding='utf-8'))
+    expected = open(case+'.yaml', 'rb').read()
+    assert dump(entry).encode('utf-8') == expected
+
+def test_golden_cases_found():
+    assert len(CASES) >= 7
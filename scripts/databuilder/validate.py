@@ -0,0 +1,355 @@
+from catalog import CATEGORIES, RANKS
+from manifest import Manifest
+from multiprocessing import Pool
+from os.path import join, basename, splitext, isdir, relpath
+from os import listdir, stat
+from hashlib import blake2b
+from glob import glob
+import json
+import re
+
+# Bump when the checks change, so incremental runs start over.
+VERSION = 4
+CACHE_FOLDER = '.validate' # Under root, per game version
+ERROR, WARNING = 'error', 'warning'
+
+DEXID = re.compile(r'\d{4}([GAHP][A-Z]?|[XY]|M\d?)?(F\d)?')
+SOURCE = re.compile(r'Core \d\.\d\+?|Homebrew')
+TYPES = ['Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison', 'Ground',
+         'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy']
+POCKETS = ['HeldItems', 'TrainerItems', 'EvolutionItem', 'Medicine', 'Pokeballs', 'TechnicalMachine']
+# Sprite sets a Pokedex Image has to be in, and ones it only should be in
+POKEMON_IMAGES = {'BookSprites': ERROR, 'HomeSprites': WARNING, 'BoxSprites': WARNING, 'ShuffleTokens': WARNING}
+IMAGE_SETS = list(POKEMON_IMAGES)+['ItemSprites']
+
+# Problems in the data that are known and waiting on a fix to the records themselves, as
+# (source path relative to root, message). They're reported as warnings, marked known, so
+# the check can still gate commits. Take an entry out once its record is fixed; a full run
+# warns about entries that no longer turn up.
+KNOWN_ISSUES = {
+    # Typo for Fire Blast
+    ('v3.0/Pokedex/Gouging Fire.json', "Learnset move 'FIre Blast' not found in Moves"),
+    # Mew can learn any move, which no single move record stands for
+    ('v3.0/Pokedex/Mew.json', "Learnset move 'Any Move' not found in Moves"),
+    # Lycanroc is only in the Pokedex as its three forms
+    ('v3.0/Items/Lycanium Z.json', "ForPokemon 'lycanroc' not found in Pokedex _id"),
+    # Lists the conditions it cures instead of naming them in a String
+    ('v3.0/Items/Baked Goods.json', 'Cures should be str, not list'),
+    # The Egg stands in for any Pokemon, so it has no abilities or Pokedex text
+    ('v3.0/Pokedex/Egg.json', 'Ability1 is empty'),
+    ('v3.0/Pokedex/Egg.json', 'DexCategory is empty'),
+    ('v3.0/Pokedex/Egg.json', 'DexDescription is empty'),
+}
+
+# # Schema, from DDL.md. field: (types, required, may be empty)
+
+NUMBER = (int, float)
+SCHEMA = {
+    'Pokedex': {
+        'Number': (int, True, False), 'DexID': (str, True, False), 'Name': (str, True, False),
+        'Type1': (str, True, False), 'Type2': (str, True, True), 'BaseHP': (int, True, False),
+        'Strength': (int, True, False), 'MaxStrength': (int, True, False),
+        'Dexterity': (int, True, False), 'MaxDexterity': (int, True, False),
+        'Vitality': (int, True, False), 'MaxVitality': (int, True, False),
+        'Special': (int, True, False), 'MaxSpecial': (int, True, False),
+        'Insight': (int, True, False), 'MaxInsight': (int, True, False),
+        'Ability1': (str, True, False), 'Ability2': (str, True, True),
+        'HiddenAbility': (str, True, True), 'EventAbilities': (str, True, True),
+        'RecommendedRank': (str, True, False), 'GenderType': (str, True, True),
+        'Legendary': (bool, True, False), 'GoodStarter': (bool, True, False), '_id': (str, True, False),
+        'DexCategory': (str, True, False), 'Height': (dict, True, False), 'Weight': (dict, True, False),
+        'DexDescription': (str, True, False), 'Evolutions': (list, True, True), 'Image': (str, True, False),
+        'Moves': (list, True, False), 'BookImageName': (str, False, True), 'BookShinyImageName': (str, False, True),
+    },
+    'Moves': {
+        # Z-Moves have a formula ("Happiness + Loyalty") for Power
+        'Name': (str, True, False), 'Type': (str, True, False), 'Power': ((int, str), True, False),
+        'Damage1': (str, True, True), 'Damage2': (str, True, True), 'Accuracy1': (str, True, True),
+        'Accuracy2': (str, True, True), 'Target': (str, True, False), 'Effect': (str, True, True),
+        'Description': (str, True, True), '_id': (str, True, False), 'Attributes': (dict, False, True),
+        'AddedEffects': (dict, False, True), 'Category': (str, True, False),
+    },
+    'Abilities': {
+        '_id': (str, True, False), 'Name': (str, True, False), 'Effect': (str, True, True),
+        'Description': (str, True, True),
+    },
+    'Natures': {
+        '_id': (str, True, False), 'Name': (str, True, False), 'Nature': (str, True, False),
+        'Confidence': (int, True, False), 'Description': (str, True, True), 'Keywords': (str, True, True),
+    },
+    'Items': {
+        'Name': (str, True, False), '_id': (str, True, False), 'Source': (str, True, False),
+        'Author': (str, False, False), 'PMD': (bool, True, False), 'Pocket': (str, True, False),
+        'Category': (str, False, True), 'Description': (str, True, True), 'OneUse': (bool, True, False),
+        'PMDPrice': ((str,)+NUMBER, False, True), 'TrainerPrice': (str, False, True), 'ForTypes': (str, False, True),
+        'ForPokemon': (str, False, True), 'HealthRestored': (int, False, True), 'Cures': (str, False, True),
+        'Boost': (str, False, True), 'Value': (int, False, True), 'MaxMovePower': (int, False, True),
+        'Image': (str, False, True),
+    },
+}
+MEASURES = {'Height': ['Meters', 'Feet'], 'Weight': ['Kilograms', 'Pounds']}
+EVOLUTION_FIELDS = ['To', 'From', 'Kind', 'Speed', 'Item', 'Stat', 'Value', 'Special',
+                    'Gender', 'Region', 'Game', 'Move', 'Stone']
+# Evolution fields that are left out, rather than left empty, when they don't apply
+EVOLUTION_REMOVE = ['Speed', 'Item', 'Stat', 'Value', 'Special']
+
+def _is(value, types):
+    # bool is an int, but a flag isn't a number and a number isn't a flag
+    if isinstance(value, bool): return types is bool or (isinstance(types, tuple) and bool in types)
+    return isinstance(value, types)
+
+def _type_name(types):
+    return '/'.join(t.__name__ for t in types) if isinstance(types, tuple) else types.__name__
+
+# # Checking one file. Runs in worker processes and only sees that file.
+
+class _Checker(object):
+    '''
+    Schema checks for one record, plus the references it makes to other records and to
+    sprites. References are resolved later, once every file's names are known.
+    '''
+
+    def __init__(self, category, game_version):
+        self.category = category
+        self.game_version = game_version
+        self.issues = []
+        self.refs = []
+
+    def error(self, message):
+        self.issues.append([ERROR, message])
+
+    def warning(self, message):
+        self.issues.append([WARNING, message])
+
+    def ref(self, kind, value, severity, what):
+        '''value has to be a Name (or _id, for kinds ending in ._id) in kind, or a file in a sprite set.'''
+        self.refs.append([kind, value, severity, what])
+
+    def check(self, entry):
+        if not isinstance(entry, dict):
+            self.error('Not a JSON object')
+            return
+        schema = SCHEMA[self.category.split('/')[-1]]
+        for field, (types, required, empty) in schema.items():
+            if field not in entry:
+                if required: self.error(f'Missing field {field}')
+                continue
+            value = entry[field]
+            if value == '':
+                if not empty: self.error(f'{field} is empty')
+            elif not _is(value, types):
+                self.error(f'{field} should be {_type_name(types)}, not {type(value).__name__}')
+        for field in entry:
+            if field not in schema: self.warning(f'Unknown field {field}')
+        getattr(self, f"_{self.category.split('/')[-1].lower()}")(entry)
+
+    def _pokedex(self, entry):
+        ranks = RANKS[self.game_version]
+        if isinstance(entry.get('DexID'), str) and not DEXID.fullmatch(entry['DexID']):
+            self.error(f"DexID {entry['DexID']!r} doesn't match {DEXID.pattern}")
+        for field in ('Type1', 'Type2'):
+            if entry.get(field) and entry[field] not in TYPES: self.error(f'{field} {entry[field]!r} is not a type')
+        if entry.get('RecommendedRank') and entry['RecommendedRank'] not in ranks:
+            self.error(f"RecommendedRank {entry['RecommendedRank']!r} is not a {self.game_version} rank")
+        for field, units in MEASURES.items():
+            if not isinstance(entry.get(field), dict): continue
+            for unit in units:
+                if not _is(entry[field].get(unit), NUMBER): self.error(f'{field} needs a number of {unit}')
+        for field in ('Ability1', 'Ability2', 'HiddenAbility', 'EventAbilities'):
+            if entry.get(field): self.ref('Abilities', entry[field], ERROR, field)
+        for learned in entry.get('Moves') or []:
+            if not isinstance(learned, dict) or not learned.get('Name'):
+                self.error(f'Learnset entry {learned!r} has no move Name')
+                continue
+            if learned.get('Learned') not in ranks:
+                self.error(f"Learnset rank {learned.get('Learned')!r} for {learned['Name']} is not a {self.game_version} rank")
+            self.ref('Moves', learned['Name'], ERROR, 'Learnset move')
+        for evolution in entry.get('Evolutions') or []:
+            self._evolution(evolution)
+        if entry.get('Image'):
+            for setname, severity in POKEMON_IMAGES.items():
+                self.ref(setname, entry['Image'], severity, 'Image')
+
+    def _evolution(self, evolution):
+        if not isinstance(evolution, dict):
+            self.error(f'Evolution {evolution!r} is not an object')
+            return
+        directions = [k for k in ('To', 'From') if k in evolution]
+        if len(directions) != 1:
+            self.error(f'Evolution {evolution!r} needs exactly one of To and From')
+        for k in directions:
+            self.ref('Pokedex', evolution[k], ERROR, f'Evolution {k}')
+        if not evolution.get('Kind'): self.error(f'Evolution {evolution!r} has no Kind')
+        for field in evolution:
+            if field not in EVOLUTION_FIELDS: self.warning(f'Unknown evolution field {field}')
+        for field in EVOLUTION_REMOVE:
+            if field in evolution and evolution[field] in ('', None):
+                self.error(f'Evolution {field} is empty, it should be removed instead')
+        if evolution.get('Speed') and evolution.get('Kind') != 'Level':
+            self.warning(f"Evolution has a Speed but is a {evolution.get('Kind')} evolution, not Level")
+        if bool(evolution.get('Stat')) != bool(evolution.get('Value')):
+            self.error('Evolution Stat and Value go together')
+        if evolution.get('Item'): self.ref('Items', evolution['Item'], WARNING, 'Evolution Item')
+
+    def _moves(self, entry):
+        pass
+
+    def _abilities(self, entry):
+        pass
+
+    def _natures(self, entry):
+        pass
+
+    def _items(self, entry):
+        if isinstance(entry.get('Source'), str) and not SOURCE.fullmatch(entry['Source']):
+            self.error(f"Source {entry['Source']!r} should be Core X.0, Core X.0+ or Homebrew")
+        if entry.get('Source') == 'Homebrew' and not entry.get('Author'):
+            self.error('Homebrew items need an Author')
+        if entry.get('Pocket') and entry['Pocket'] not in POCKETS:
+            self.error(f"Pocket {entry['Pocket']!r} is not one of {', '.join(POCKETS)}")
+        price = 'PMDPrice' if entry.get('PMD') else 'TrainerPrice'
+        if price not in entry: self.error(f'Missing field {price}')
+        if entry.get('Boost') and 'Value' not in entry: self.error('Boost needs a Value')
+        for t in (entry.get('ForTypes') or '').split():
+            if t not in TYPES: self.error(f'ForTypes {t!r} is not a type')
+        for _id in (entry.get('ForPokemon') or '').split():
+            self.ref('Pokedex._id', _id, ERROR, 'ForPokemon')
+        image = entry.get('Image') or (f"{entry['_id']}.png" if entry.get('_id') else None)
+        if image: self.ref('ItemSprites', image, WARNING, 'Image')
+
+def _check(job):
+    '''
+    Reads, hashes and checks one source file. Returns its cache record, in the shape
+    Manifest.record writes, plus the issues and references found.
+    '''
+    category, src, game_version = job
+    data = open(src, 'rb').read()
+    st = stat(src)
+    checker = _Checker(category, game_version)
+    try:
+        entry = json.loads(data)
+    except ValueError as e:
+        entry = {}
+        checker.error(f'Invalid JSON: {e}')
+    else:
+        checker.check(entry)
+    if not isinstance(entry, dict): entry = {}
+    return src, {
+        'category': category,
+        'stat': [st.st_size, st.st_mtime_ns],
+        'hash': blake2b(data, digest_size=16).hexdigest(),
+        'name': entry.get('Name'),
+        '_id': entry.get('_id'),
+        'deps': checker.refs,
+        'issues': checker.issues,
+    }
+
+# # Checking the whole dataset
+
+def _sources(root, game_version, homebrew):
+    '''(category, path) for every file to check. Homebrew categories are named Homebrew/{category}.'''
+    sources = [(c, src) for c in CATEGORIES for src in sorted(glob(join(root, game_version, c, '*.json')))]
+    if homebrew:
+        sources += [(f'Homebrew/{c}', src) for c in CATEGORIES for src in sorted(glob(join(root, 'Homebrew', c, '*.json')))]
+    return sources
+
+def _keys(src, record):
+    '''The (kind, value) pairs a record can be referenced by.'''
+    category = record['category']
+    keys = {(category, splitext(basename(src))[0])}
+    if record.get('name') is not None: keys.add((category, record['name']))
+    if record.get('_id') is not None: keys.add((f'{category}._id', record['_id']))
+    return keys
+
+def validate(root='../../', game_version='v3.0', workers=1, incremental=False, homebrew=True):
+    '''
+    Checks every file of game_version (and Homebrew) against the DDL.md schema, and every
+    reference between records: learnset moves, abilities, evolutions, evolution items,
+    ForPokemon _ids and sprites. Each file is read once, on a pool of workers, and only the
+    names and references it yields are kept to resolve the rest against.
+
+    With incremental on, files unchanged since the last run (see manifest.Manifest, kept under
+    root/.validate) aren't read again. Only changed files and the files that reference one of
+    them (by old or new name) are checked and reported. A change to any sprite set starts over.
+
+    Returns a sorted list of (severity, source path, message).
+    '''
+    images = {s: set(listdir(join(root, 'images', s))) if isdir(join(root, 'images', s)) else set() for s in IMAGE_SETS}
+    listing = blake2b(json.dumps({s: sorted(names) for s, names in images.items()}).encode(), digest_size=8).hexdigest()
+    manifest = Manifest(join(root, CACHE_FOLDER, game_version), f'Validator/{VERSION}/{game_version}/{homebrew}/{listing}')
+
+    sources = _sources(root, game_version, homebrew)
+    cached = manifest.sources if incremental else {}
+    jobs = [(category, src, game_version) for category, src in sources if src not in cached or manifest.changed(src)]
+    if workers > 1 and len(jobs) > workers:
+        with Pool(workers) as pool:
+            fresh = dict(pool.imap_unordered(_check, jobs, 32))
+    else:
+        fresh = dict(map(_check, jobs))
+
+    records = {src: fresh[src] if src in fresh else cached[src] for _, src in sources}
+    index = {}
+    for src, record in records.items():
+        for kind, value in _keys(src, record):
+            index.setdefault(kind, {}).setdefault(value, []).append(src)
+    for setname, names in images.items():
+        index[setname] = dict.fromkeys(names)
+
+    # What to report on: everything, or what changed and what references it
+    if incremental and manifest.valid:
+        changed = set()
+        for src in fresh: changed |= _keys(src, records[src]) | (_keys(src, cached[src]) if src in cached else set())
+        for src in set(cached)-set(records): changed |= _keys(src, cached[src])
+        checked = set(fresh) | {src for src, record in records.items()
+                                if any((kind, value) in changed for kind, value, _, _ in record['deps'])}
+    else:
+        checked = set(records)
+
+    issues = []
+    for src in checked:
+        record = records[src]
+        issues += [(severity, src, message) for severity, message in record['issues']]
+        for kind, value, severity, what in record['deps']:
+            if value not in index.get(kind, {}):
+                target = kind.replace('._id', ' _id') if '._id' in kind else kind
+                issues.append((severity, src, f'{what} {value!r} not found in {target}'))
+        # A few moves share an _id and engines key packs on both, so only a shared Name is an error
+        for field, kind, severity in (('name', record['category'], ERROR), ('_id', f"{record['category']}._id", WARNING)):
+            others = [o for o in index.get(kind, {}).get(record[field], []) if o != src]
+            if others: issues.append((severity, src, f"{'Name' if field == 'name' else field} {record[field]!r} is also used by {', '.join(others)}"))
+
+    # Known issues are warnings, and ones that are gone are pointed out on a full run
+    known = {(relpath(src, root).replace('\\', '/'), message) for _, src, message in issues}
+    issues = [(WARNING, src, f'{message} (known issue)') if (relpath(src, root).replace('\\', '/'), message) in KNOWN_ISSUES
+              else (severity, src, message) for severity, src, message in issues]
+    if checked == set(records):
+        for path, message in sorted(KNOWN_ISSUES - known):
+            src = join(root, path)
+            if src in records: issues.append((WARNING, src, f'Known issue {message!r} no longer found, take it out of KNOWN_ISSUES'))
+
+    manifest.sources = records
+    manifest.save()
+    return sorted(issues, key=lambda i: (i[1], i[0], i[2]))
+
+def main(argv=None):
+    import argparse
+    from os import cpu_count
+    parser = argparse.ArgumentParser(description='Checks the dataset against DDL.md and every reference between records.')
+    parser.add_argument('game_version', nargs='?', default='v3.0')
+    parser.add_argument('--root', default='../../')
+    parser.add_argument('--workers', type=int, default=cpu_count() or 1)
+    parser.add_argument('--incremental', action='store_true', help='only check files changed since the last run, and what references them')
+    parser.add_argument('--no-homebrew', dest='homebrew', action='store_false')
+    parser.add_argument('--errors-only', action='store_true', help="don't print warnings")
+    parser.add_argument('--strict', action='store_true', help='fail on warnings too')
+    args = parser.parse_args(argv)
+
+    issues = validate(args.root, args.game_version, args.workers, args.incremental, args.homebrew)
+    errors = sum(1 for severity, _, _ in issues if severity == ERROR)
+    for severity, src, message in issues:
+        if severity == ERROR or not args.errors_only: print(f'{severity.upper()}: {src}: {message}')
+    print(f'{errors} errors, {len(issues)-errors} warnings')
+    if errors or (args.strict and issues): raise SystemExit(1)
+
+if __name__ == '__main__':
+  main()
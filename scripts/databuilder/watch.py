@@ -0,0 +1,141 @@
+from catalog import CATEGORIES
+from os.path import join, isdir
+from os import read, close, scandir
+from select import select
+import ctypes
+import ctypes.util
+import struct
+import time
+
+DEBOUNCE = 0.15 # Seconds without a new change before a burst of saves is rebuilt
+POLL_INTERVAL = 0.5
+
+# inotify(7) flags
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_DELETE = 0x8, 0x40, 0x80, 0x200
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct('iIII') # wd, mask, cookie, len, then len bytes of name
+
+def folders(layers):
+    '''The record folders a build reads: each category of each layer, see Catalog.layers.'''
+    return [join(folder, c) for _, folder in layers for c in CATEGORIES if isdir(join(folder, c))]
+
+class InotifyWatcher(object):
+    '''Record files saved, moved or deleted in folders, from Linux inotify through libc.'''
+
+    def __init__(self, watched):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'): raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0: raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.folders = {}
+        mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+        for folder in watched:
+            wd = libc.inotify_add_watch(self.fd, folder.encode(), mask)
+            if wd < 0: raise OSError(ctypes.get_errno(), f'Could not watch {folder}')
+            self.folders[wd] = folder
+
+    def changes(self, timeout=None):
+        '''Paths of the .json files changed within timeout seconds (or whenever the next change is).'''
+        if not select([self.fd], [], [], timeout)[0]: return set()
+        data, paths, offset = read(self.fd, 64*1024), set(), 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+            name = data[offset+EVENT.size:offset+EVENT.size+length].rstrip(b'\0').decode()
+            offset += EVENT.size+length
+            if wd in self.folders and name.endswith('.json'): paths.add(join(self.folders[wd], name))
+        return paths
+
+    def close(self):
+        close(self.fd)
+
+class PollingWatcher(object):
+    '''Record files changed in folders, found by comparing mtimes and sizes every interval.'''
+
+    def __init__(self, watched, interval=POLL_INTERVAL):
+        self.folders = watched
+        self.interval = interval
+        self._seen = self._snapshot()
+
+    def _snapshot(self):
+        seen = {}
+        for folder in self.folders:
+            for f in scandir(folder):
+                if f.name.endswith('.json'):
+                    st = f.stat()
+                    seen[join(folder, f.name)] = (st.st_mtime_ns, st.st_size)
+        return seen
+
+    def changes(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic()+timeout
+        while True:
+            now = self._snapshot()
+            paths = {p for p in now.keys() | self._seen.keys() if now.get(p) != self._seen.get(p)}
+            self._seen = now
+            if paths or (deadline is not None and time.monotonic() >= deadline): return paths
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline-time.monotonic())))
+
+    def close(self):
+        pass
+
+def watcher(watched, polling=False):
+    '''An inotify watcher where the platform has one, a polling one otherwise.'''
+    if not polling:
+        try:
+            return InotifyWatcher(watched)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(watched)
+
+def _wait(source, debounce):
+    '''Blocks until something changes, then keeps collecting until debounce seconds pass quietly.'''
+    paths = source.changes()
+    while True:
+        more = source.changes(debounce)
+        if not more: return paths
+        paths |= more
+
+def _build(driver, stages):
+    '''Runs each stage incrementally and closes the driver. Returns how many records were rebuilt.'''
+    rebuilt = 0
+    for stage in stages:
+        rebuilt += sum(1 for _ in getattr(driver, f'iter_{stage}')())
+    driver.close()
+    return rebuilt
+
+def watch(engine, stages, root='../../', polling=False, debounce=DEBOUNCE, overlays=(), once=False):
+    '''
+    Brings engine's output up to date with an incremental build, then rebuilds whatever each
+    burst of saves touches: the changed records, and the records that embed them (see
+    Engine.dependencies), e.g. every Pokemon page whose learnset has a changed move. The same
+    driver, catalog and engine are kept between rebuilds, so only changed files are read again.
+
+    A rebuild that fails (a half typed JSON file, say) is dropped, and the next save tries again.
+    Overlays (Homebrew, say) are built over the core records and watched with them.
+    Runs until interrupted, or returns after the first rebuild with once on.
+    '''
+    from driver import Driver
+    driver = Driver(engine, root=root, incremental=True, overlays=overlays)
+    source = watcher(folders(driver.catalog.layers), polling)
+    try:
+        start = time.perf_counter()
+        print(f'{_build(driver, stages)} records brought up to date in {time.perf_counter()-start:.2f}s. '
+              f'Watching with {type(source).__name__}...', flush=True)
+        while True:
+            paths = _wait(source, debounce)
+            start = time.perf_counter()
+            driver.refresh(paths)
+            try:
+                rebuilt = _build(driver, stages)
+            except Exception as e:
+                engine.abort()
+                # Go back to the last manifest that was saved, so the records this pass did
+                # get to are rebuilt again with the rest next time
+                driver.manifest = engine.open_manifest()
+                print(f'Rebuild failed, waiting for the next change: {type(e).__name__}: {e}', flush=True)
+                continue
+            print(f'{len(paths)} changed, {rebuilt} records rebuilt in {(time.perf_counter()-start)*1000:.0f}ms', flush=True)
+            if once: return rebuilt
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()